@@ -1,10 +1,66 @@
 import pandas as pd
 import plotly.express as px
-from dash import Dash, dcc, html, dash_table
+from dash import Dash, ctx, dcc, html, dash_table, no_update
 from dash.dependencies import Input, Output, State
+from flask import Response, g, has_request_context, jsonify, request
 import dash_bootstrap_components as dbc
+import contextvars
+import json
 import numpy as np
 import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote, unquote, urlencode
+
+from ledger import (
+    EXPENSE,
+    INCOME,
+    INVENTORY_FILE,
+    LINE_COLUMN,
+    MONTH_NAMES,
+    PNL_LINES,
+    AggregationCube,
+    BatchRejected,
+    InboxWatcher,
+    Inventory,
+    JOB_CANCELLED,
+    JOB_DONE,
+    JOB_FAILED,
+    JobQueue,
+    LoadedLedger,
+    MetricsRegistry,
+    period_kinds_from_options,
+    period_matrix,
+    NUMBER_FORMAT,
+    TOTAL_ROW_MARKER,
+    VENDOR_COLUMN,
+    classify_rows,
+    cogs_line_deltas,
+    hierarchical_table_styles,
+    list_partitions,
+    negate_expenses,
+    PivotCache,
+    load_inventory,
+    load_ledger,
+    open_partition,
+    partition_path,
+    partition_source,
+    pivot_table_styles,
+    pnl_matrix,
+    pnl_table_styles,
+    table_columns,
+    apply_query,
+    query_page,
+    report_export_columns,
+    save_inventory,
+    stage,
+    write_frame_xlsx,
+    write_partition,
+)
 
 # נוצר תיקיית assets אם היא לא קיימת
 os.makedirs('assets', exist_ok=True)
@@ -23,72 +79,353 @@ data = {
     'סכום': [50000, 75000, 20000, 5000, 55000, 70000, 22000, 5200,
               60000, 80000, 21000, 5500, 62000, 78000, 23000, 5800]
 }
-df_full = pd.DataFrame(data)
 
 # Pre-processing for the Hierarchical Report and Pivot
-month_order = ['ינואר', 'פברואר', 'מרץ', 'אפריל', 'מאי', 'יוני', 'יולי', 'אוגוסט', 'ספטמבר', 'אוקטובר', 'נובמבר', 'דצמבר']
+month_order = MONTH_NAMES
+
+# Year used in period labels (Q1/2025...) when the ledger has no 'שנה' column
+DEFAULT_REPORT_YEAR = 2025
+
+# Directory for the memory-mapped columnar copy of the ledger (unset: keep it in process memory)
+LEDGER_MMAP_DIR = os.environ.get('LEDGER_MMAP_DIR')
+
+# Aggregates computed by the report callbacks, keyed by (ledger version, callback parameters)
+pivot_cache = PivotCache(maxsize=64)
+
+# Raw transactions pages - small, but kept apart so paging never evicts report aggregates
+raw_page_cache = PivotCache(maxsize=128)
+
+# Most ledger lines a drill-down sends to the browser (the summary still counts all of them)
+DRILLDOWN_MAX_ROWS = 5000
+
+# Row levels the pivot tab opens with, and the raw transactions table's page size
+DEFAULT_PIVOT_ROW_LEVEL = 'קוד מיון, חשבון'
+RAW_PAGE_SIZE = 10
+
+# Computes the other tabs' aggregates while the first tab is on screen
+prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tab-prefetch')
+
+# (search, future) of the latest prefetch per partition; a newer search cancels it if it has not started
+prefetches = {}
+prefetch_lock = threading.Lock()
+
+# Serializes ledger appends; callbacks keep reading the previous LoadedLedger until the swap
+ledger_lock = threading.Lock()
 
-def prepare_data_for_display(dataframe, group_level, display_quarters=False):
+# Uncached report views of ledgers with at least this many rows (and every Excel export) are
+# built by report_jobs in separate processes, so a long build does not tie up a request thread
+REPORT_JOB_MIN_ROWS = int(os.environ.get('REPORT_JOB_MIN_ROWS', 500_000))
+
+def reset_job_worker():
     """
-    Generates a DataFrame suitable for the hierarchical table based on grouping level.
+    Runs in every new report job process: a request thread of the parent may
+    have held the cache locks at fork time, so they are replaced.
     """
-    df_temp = dataframe.copy()
+    for cache in (resident_ledgers, pivot_cache, raw_page_cache):
+        cache.after_fork()
+
+# REPORT_JOB_DIR holds job status and result files; gunicorn workers share it when it is
+# created before the fork (preload), so a poll can reach any worker
+report_jobs = JobQueue(os.environ.get('REPORT_JOB_DIR') or tempfile.mkdtemp(prefix='pnl-jobs-'),
+                       max_workers=int(os.environ.get('REPORT_JOB_WORKERS', 2)), initializer=reset_job_worker)
+
+# --- Ledgers ---
+# LEDGER_PARTITIONS is a root of company/year partitions (see ledger.partitions): the header's
+# selector picks one per browser, and only partitions in use are loaded. Unset: one ledger,
+# from LEDGER_CSV or the sample data above, under the partition key None.
+LEDGER_PARTITIONS = os.environ.get('LEDGER_PARTITIONS')
+PARTITION_COOKIE = 'ledger-partition'
+
+# Loaded ledgers (LoadedLedger) by (partition, data directory it was read from); the least recently
+# used is dropped when a new one is selected
+resident_ledgers = PivotCache(maxsize=int(os.environ.get('RESIDENT_PARTITIONS', 4)))
+
+# Partition of code that runs outside a request for one (prefetch threads, report jobs)
+partition_override = contextvars.ContextVar('partition_override', default=None)
+
+available_partitions = list_partitions(LEDGER_PARTITIONS) if LEDGER_PARTITIONS else []
+
+def latest_partition(company):
+    return max((partition for partition in available_partitions if partition[0] == company), default=None)
+
+# Shown until a browser selects a partition: the latest year of the first company
+default_partition = latest_partition(available_partitions[0][0]) if available_partitions else None
+
+def refresh_partitions():
+    """Re-reads the stored partitions (another worker may have added a year since)."""
+    global available_partitions
+    available_partitions = list_partitions(LEDGER_PARTITIONS)
+    return available_partitions
+
+def request_partition():
+    """Partition selected in this request's browser (PARTITION_COOKIE), if it still exists."""
+    if not has_request_context() or PARTITION_COOKIE not in request.cookies:
+        return None
+    try:
+        company, year = json.loads(unquote(request.cookies[PARTITION_COOKIE]))
+    except (TypeError, ValueError):
+        return None
+    if (company, year) not in available_partitions and LEDGER_PARTITIONS:
+        refresh_partitions()
+    return (company, year) if (company, year) in available_partitions else None
+
+def active_partition():
+    return partition_override.get() or request_partition() or default_partition
+
+def run_in_partition(partition, func, *args):
+    """Calls ``func(*args)`` with ``partition`` active (in threads and processes without its request)."""
+    token = partition_override.set(partition)
+    try:
+        return func(*args)
+    finally:
+        partition_override.reset(token)
+
+def load_partition(partition):
+    return LoadedLedger.from_frame(open_partition(LEDGER_PARTITIONS, *partition), month_order)
+
+def resident_key(partition):
+    """
+    Key of ``partition`` in resident_ledgers. It includes the partition's
+    current data directory, so a partition rewritten by the ingesting worker
+    is a miss and is loaded again.
+    """
+    if partition is None:
+        return None, None
+    return partition, partition_source(LEDGER_PARTITIONS, *partition)
+
+def drop_replaced(key):
+    """Drops the resident ledgers of ``key``'s partition read from other data directories."""
+    for resident, _ in resident_ledgers.items():
+        if resident[0] == key[0] and resident != key:
+            resident_ledgers.discard(resident)
+
+def install_ledger(partition, ledger):
+    key = resident_key(partition)
+    drop_replaced(key)
+    resident_ledgers.put(key, ledger)
+
+def resident_ledger(partition):
+    """The LoadedLedger of ``partition``, loaded on first use and after it was rewritten on disk."""
+    key = resident_key(partition)
+
+    def load():
+        ledger = load_partition(partition)
+        drop_replaced(key)
+        return ledger
+    return resident_ledgers.get_or_compute(key, load)
+
+def active_ledger():
+    """The LoadedLedger of the active partition."""
+    return resident_ledger(active_partition())
+
+def set_ledger(dataframe, partition=None):
+    """
+    Installs ``dataframe`` as the ledger of ``partition`` (None: the single
+    ledger) and rebuilds everything derived from it.
+    """
+    install_ledger(partition, LoadedLedger.from_frame(dataframe, month_order, LEDGER_MMAP_DIR))
+    pivot_cache.clear()
+    raw_page_cache.clear()
+    # Job processes forked from the previous ledger must not build reports of this one
+    report_jobs.restart()
+
+def append_ledger(new_rows, partition=None, company=None):
+    """
+    Appends newly posted journal entries to the ledger of ``partition`` (None: the single ledger).
+
+    Only the new rows are aggregated (LoadedLedger.append), and cached search
+    cubes get the contribution of their matching new rows. Report frames are
+    re-derived from the merged cubes (no ledger scan). With LEDGER_PARTITIONS,
+    a batch belongs to the stored ``company``: its rows go to that company's
+    partition of their 'שנה', which is written back to disk and served from
+    the new copy's memory maps. Returns the number of rows appended; raises
+    BatchRejected for a batch of an unknown company.
+    """
+    if partition is None and LEDGER_PARTITIONS:
+        if company not in {name for name, _ in refresh_partitions()}:
+            raise BatchRejected(f'no stored company {company!r} to append the batch to')
+        if 'שנה' not in new_rows.columns:
+            raise BatchRejected("the batch has no 'שנה' column to pick its partitions by")
+        return sum(append_ledger(rows, (company, int(year)))
+                   for year, rows in new_rows.groupby('שנה', observed=True))
+    with ledger_lock:
+        if partition is not None and partition not in available_partitions:
+            # First rows of a new year
+            ledger, new_rows = LoadedLedger.from_frame(new_rows, month_order), new_rows
+            old_version = None
+        else:
+            old = resident_ledger(partition)
+            ledger, new_rows = old.append(new_rows, month_order, None if partition else LEDGER_MMAP_DIR)
+            if new_rows.empty:
+                return 0
+            old_version = old.version
+
+        n_rows = len(ledger.frame) - len(new_rows)
+        for key, value in pivot_cache.items():
+            if key[0] != old_version:
+                continue
+            pivot_cache.discard(key)
+            if key[1] == 'search-cube':
+                mask = ledger.search_index.row_mask(key[2], start=n_rows)
+                if mask.any():
+                    value = value.merge(AggregationCube.from_ledger(new_rows[mask], month_order))
+                pivot_cache.put((ledger.version, 'search-cube', key[2]), value)
+        raw_page_cache.clear()
+
+        if partition is not None:
+            write_partition(ledger.frame, LEDGER_PARTITIONS, *partition)
+            refresh_partitions()
+            # The same rows, mapped from the copy just written instead of held in memory
+            ledger = ledger.with_frame(open_partition(LEDGER_PARTITIONS, *partition))
+        install_ledger(partition, ledger)
+        report_jobs.restart()
+    run_in_partition(partition, warm_up)
+    return len(new_rows)
+
+# LEDGER_CSV points at the ERP transactions export; without it the sample data above is used.
+# Partitions are loaded on first use (wsgi.py's warm-up loads the default one before the fork).
+if default_partition is None:
+    if os.environ.get('LEDGER_CSV'):
+        set_ledger(load_ledger(os.environ['LEDGER_CSV']))
+    else:
+        set_ledger(pd.DataFrame(data))
+
+# Directory polled for new journal-entry batch exports (unset: no incremental ingestion)
+LEDGER_INBOX = os.environ.get('LEDGER_INBOX')
+INGEST_LOCK = '.ingest.lock'
+
+def start_inbox_watcher():
+    """
+    Starts polling LEDGER_INBOX for batch files and appending them to the ledger.
+    Threads do not survive a fork, so gunicorn calls this in every worker (post_fork).
+
+    Partitions are shared on disk, so one worker - the holder of the ingestion
+    lock - appends and writes them, and the others reload a partition once
+    its data directory changed (resident_key). Batches are read from one
+    LEDGER_INBOX/<company> subdirectory per company; a batch elsewhere is
+    rejected rather than guessed. The
+    single ledger lives in each worker's memory, so every worker appends it;
+    its columnar copy is content-addressed, and a version another worker
+    already stored is reused.
+    """
+    if not LEDGER_INBOX:
+        return None
+    if not LEDGER_PARTITIONS:
+        return InboxWatcher(LEDGER_INBOX, lambda batch, path: append_ledger(batch)).start()
+    return InboxWatcher(LEDGER_INBOX, ingest_company_batch, lock_path=os.path.join(LEDGER_PARTITIONS, INGEST_LOCK),
+                        subdirectories=True).start()
+
+def ingest_company_batch(batch, path):
+    """Appends a batch from LEDGER_INBOX/<company>/ to that company's partitions."""
+    directory = os.path.dirname(os.path.abspath(path))
+    if os.path.dirname(directory) != os.path.abspath(LEDGER_INBOX):
+        raise BatchRejected('batches go into the LEDGER_INBOX subdirectory of their company')
+    return append_ledger(batch, company=os.path.basename(directory))
+
+
+def build_report_frame(cube, pivot_index, period_kinds=(), categories=None):
+    """
+    Rolls the aggregation cube up to ``pivot_index`` and adds period/total columns,
+    the 'סוג' column and negative expense values. Shared by the hierarchical and pivot reports.
+    ``categories`` limits the account rows to those categories (see AggregationCube.rollup).
+    """
+    with stage('rollup'):
+        df_pivot_month = cube.rollup(pivot_index, categories)
+    return finish_report_frame(df_pivot_month, cube, period_kinds)
+
+def finish_report_frame(df_pivot_month, cube, period_kinds=()):
+    """
+    Adds the period/total columns, 'סוג' and negative expense values to a frame of
+    label columns followed by one column per ``cube.months`` entry.
+    """
+    present_months_in_data = list(cube.months)
+
+    # Quarters / halves / YTD / rolling-12 and the total, from one months x periods product
+    with stage('periods'):
+        period_cols, period_map = period_matrix(cube.axis, period_kinds, default_year=DEFAULT_REPORT_YEAR)
+        period_values = df_pivot_month[present_months_in_data].to_numpy(dtype=np.float64) @ period_map
+        df_pivot_month = pd.concat(
+            [df_pivot_month, pd.DataFrame(period_values, columns=period_cols, index=df_pivot_month.index)], axis=1
+        )
+
+    # Add a 'סוג' column for coloring (Income/Expense) - by category, or via the account lookup
+    with stage('classify'):
+        df_pivot_month['סוג'] = classify_rows(df_pivot_month, active_ledger().account_types)
+
+    # Adjust expenses to be negative for proper P&L summation (if needed for drilldown totals)
+    value_cols = present_months_in_data + period_cols
+    with stage('negate'):
+        negate_expenses(df_pivot_month, value_cols)
+
+        # Agorot precision is all the tables show - keeps float noise out of the JSON payload
+        df_pivot_month[value_cols] = df_pivot_month[value_cols].round(2)
     
-    # Calculate initial pivot based on group_level
+    return df_pivot_month, value_cols
+
+# 'hierarchy-level-radio' value of the collapsible tree: category rows, account rows on demand
+TREE_LEVEL = 'עץ'
+TREE_COLLAPSED = '◂'
+TREE_EXPANDED = '▾'
+
+# 'ספק' label of the lines that have no vendor
+NO_VENDOR = 'ללא ספק'
+
+def hierarchy_index(group_level):
+    """
+    Row levels of the hierarchical report for a 'hierarchy-level-radio' value.
+    """
     if group_level == 'קוד מיון':
-        pivot_index = ['קוד מיון']
+        return ['קוד מיון']
     elif group_level == 'חשבון':
-        pivot_index = ['חשבון']
-    else: # 'קוד מיון' and 'חשבון'
-        pivot_index = ['קוד מיון', 'חשבון']
-
-    df_pivot_month = df_temp.pivot_table(
-        index=pivot_index,
-        columns='חודש',
-        values='סכום',
-        aggfunc='sum',
-        fill_value=0
+        return ['חשבון']
+    else: # 'קוד מיון' and 'חשבון' (also the tree's columns)
+        return ['קוד מיון', 'חשבון']
+
+def prepare_data_for_display(cube, group_level, period_kinds=()):
+    """
+    Generates a DataFrame suitable for the hierarchical table based on grouping level.
+    """
+    return build_report_frame(cube, hierarchy_index(group_level), period_kinds)
+
+def search_mask(search):
+    """
+    Rows of the active ledger matching the search bar text, or None when the search is empty.
+    """
+    return active_ledger().search_index.row_mask(search)
+
+def search_cube(search):
+    """
+    Aggregation cube for the rows matching ``search`` (the full-ledger cube when empty).
+    """
+    search = (search or '').strip()
+    ledger = active_ledger()
+    if not search:
+        return ledger.cube
+    return pivot_cache.get_or_compute(
+        (ledger.version, 'search-cube', search),
+        lambda: AggregationCube.from_ledger(ledger.frame[search_mask(search)], month_order)
     )
 
-    # Filter for only months present in the dataframe and ensure order
-    present_months_in_data = [month for month in month_order if month in df_pivot_month.columns]
-    df_pivot_month = df_pivot_month[present_months_in_data]
-
-    # Calculate Quarterly Totals
-    quarter_cols = []
-    if display_quarters:
-        q1_months = [m for m in ['ינואר', 'פברואר', 'מרץ'] if m in present_months_in_data]
-        if q1_months:
-            df_pivot_month['Q1/2025'] = df_pivot_month[q1_months].sum(axis=1)
-            quarter_cols.append('Q1/2025')
-        
-        q2_months = [m for m in ['אפריל', 'מאי', 'יוני'] if m in present_months_in_data]
-        if q2_months:
-            df_pivot_month['Q2/2025'] = df_pivot_month[q2_months].sum(axis=1)
-            quarter_cols.append('Q2/2025')
-        # Add more quarters as needed
-
-    # Calculate Total Sum
-    df_pivot_month['סה"כ'] = df_pivot_month[present_months_in_data + quarter_cols].sum(axis=1)
-
-    df_pivot_month = df_pivot_month.reset_index()
-
-    # Add a 'סוג' column for coloring (Income/Expense) - relevant for 'קוד מיון' level
-    if 'קוד מיון' in df_pivot_month.columns:
-        df_pivot_month['סוג'] = df_pivot_month['קוד מיון'].apply(lambda x: 'הכנסות' if x == 'הכנסות' else 'הוצאות')
-    else: # If grouping by 'חשבון' only, infer type from original df_full
-        df_pivot_month['סוג'] = df_pivot_month['חשבון'].apply(
-            lambda x: 'הכנסות' if x in df_full[df_full['קוד מיון'] == 'הכנסות']['חשבון'].unique() else 'הוצאות'
-        )
+def search_rows(search):
+    """
+    The active ledger restricted to the rows matching the search bar text.
+    """
+    frame = active_ledger().frame
+    mask = search_mask(search)
+    return frame if mask is None else frame[mask]
 
-    # Adjust expenses to be negative for proper P&L summation (if needed for drilldown totals)
-    value_cols = present_months_in_data + quarter_cols + ['סה"כ']
+def build_hierarchical_frame(cube, group_level, period_kinds):
+    """
+    Hierarchical report rows followed by the global total row.
+    """
+    df_display, value_cols = prepare_data_for_display(cube, group_level, period_kinds)
+
+    # Add a global total row at the end
+    total_row_data = {'קוד מיון': 'סה"כ כולל', 'חשבון': '', 'סוג': TOTAL_ROW_MARKER}
     for col in value_cols:
-        # Check if the column exists before trying to modify it
-        if col in df_pivot_month.columns:
-            df_pivot_month.loc[df_pivot_month['סוג'] == 'הוצאות', col] = -df_pivot_month.loc[df_pivot_month['סוג'] == 'הוצאות', col]
-    
-    return df_pivot_month, value_cols
+        total_row_data[col] = df_display[col].sum()
+
+    return pd.concat([df_display, pd.DataFrame([total_row_data])], ignore_index=True), value_cols
 
 # App Initialization
 app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
@@ -114,6 +451,11 @@ colors = {
     'button_text': 'white'
 }
 
+TAB_IDS = ("hierarchical-report-tab", "pnl-tab", "pivot-tab", "monthly-quarterly-interactive-tab", "raw-data-tab")
+
+def tab_pane_id(tab_id):
+    return f"{tab_id}-pane"
+
 app.layout = dbc.Container([
     # --- Header ---
     html.Div([
@@ -123,9 +465,63 @@ app.layout = dbc.Container([
             'textAlign': 'right', 'color': colors['primary_green'], 'fontFamily': 'Assistant', 'fontWeight': 'bold'
         }),
         dbc.Row([
+            # Company / year partition (LEDGER_PARTITIONS only); a new selection reloads the page
+            dbc.Col([
+                dcc.Dropdown(id="company-selector", placeholder="חברה", clearable=False,
+                             style={'fontFamily': 'Noto Sans Hebrew', 'direction': 'rtl', 'minWidth': '180px'}),
+                dcc.Dropdown(id="year-selector", placeholder="שנה", clearable=False,
+                             style={'fontFamily': 'Noto Sans Hebrew', 'direction': 'rtl', 'minWidth': '100px'}),
+            ], width="auto", style={'display': 'flex', 'gap': '8px'} if available_partitions else {'display': 'none'}),
             dbc.Col(dbc.Input(id="search-bar", placeholder="חיפוש...", type="text", debounce=True), width={"size": 4, "offset": 0}),
-            dbc.Col(dbc.Button("ייצוא לאקסל", id="export-button", color="success", className="me-1"), width={"size": 2, "offset": 0}),
-        ], justify="end", className="mb-4")
+            dbc.Col([
+                dbc.Button("ייצוא לאקסל", id="export-button", color="success", className="me-1"),
+                html.Span(id="export-status", style={'marginRight': '10px', 'color': colors['dark_gray']}),
+            ], width={"size": 2, "offset": 0}),
+        ], justify="end", className="mb-4"),
+        # Export runs on a worker thread; the interval polls until the workbook is ready
+        dcc.Location(id="page-location", refresh=True),
+        dcc.Download(id="export-download"),
+        dcc.Store(id="export-job"),
+        dcc.Interval(id="export-poll", interval=500, disabled=True),
+        # Current parameters of each report, for the export button
+        dcc.Store(id="hierarchical-params"),
+        dcc.Store(id="pnl-params"),
+        dcc.Store(id="pivot-params"),
+        dcc.Store(id="raw-params"),
+        # Transactions behind a clicked report cell
+        dbc.Modal([
+            dbc.ModalHeader(dbc.ModalTitle(id="drilldown-title")),
+            dbc.ModalBody([
+                html.Div(id="drilldown-summary", style={'marginBottom': '10px', 'color': colors['dark_gray']}),
+                dash_table.DataTable(
+                    id='drilldown-table',
+                    style_table={'overflowX': 'auto', 'direction': 'rtl'},
+                    style_cell={
+                        'fontFamily': 'Noto Sans Hebrew',
+                        'textAlign': 'right',
+                        'padding': '8px',
+                        'border': f'1px solid {colors["medium_gray"]}',
+                        'minWidth': '90px',
+                        'color': colors['text']
+                    },
+                    style_header={
+                        'backgroundColor': colors['primary_green'],
+                        'color': 'white',
+                        'fontWeight': 'bold',
+                        'textAlign': 'right',
+                        'fontFamily': 'Assistant',
+                        'border': f'1px solid {colors["medium_gray"]}'
+                    },
+                    style_data_conditional=[
+                        {'if': {'row_index': 'odd'}, 'backgroundColor': colors['light_gray']}
+                    ],
+                    sort_action="native",
+                    filter_action="native",
+                    page_action="native",
+                    page_size=15,
+                ),
+            ]),
+        ], id="drilldown-modal", size="xl", is_open=False, scrollable=True, style={'direction': 'rtl'}),
     ], style={'backgroundColor': colors['background'], 'padding': '20px', 'borderRadius': '8px'}),
 
     html.Hr(),
@@ -135,6 +531,9 @@ app.layout = dbc.Container([
         dbc.Tab(label="דוח היררכי חודשי", tab_id="hierarchical-report-tab",
                 active_label_style={'color': colors['text'], 'backgroundColor': colors['primary_green']},
                 label_style={'color': colors['primary_green'], 'borderColor': colors['primary_green'], 'borderWidth': '1px'}),
+        dbc.Tab(label="דוח רווח והפסד", tab_id="pnl-tab",
+                active_label_style={'color': colors['text'], 'backgroundColor': colors['primary_green']},
+                label_style={'color': colors['primary_green'], 'borderColor': colors['primary_green'], 'borderWidth': '1px'}),
         dbc.Tab(label="Pivot חודשי", tab_id="pivot-tab",
                 active_label_style={'color': colors['text'], 'backgroundColor': colors['primary_green']},
                 label_style={'color': colors['primary_green'], 'borderColor': colors['primary_green'], 'borderWidth': '1px'}),
@@ -147,15 +546,134 @@ app.layout = dbc.Container([
     ], id="tabs", active_tab="hierarchical-report-tab", className="mb-4", style={'direction': 'rtl'}), # RTL for tabs
 
     # --- Tab Content ---
-    html.Div(id="tab-content", style={'padding': '20px', 'backgroundColor': colors['background'], 'borderRadius': '8px'}),
+    # One pane per tab, built on its first visit and then only shown/hidden, so every
+    # tab keeps its components (and their data) for the rest of the session
+    dcc.Store(id="rendered-tabs", data=[]),
+    html.Div([html.Div(id=tab_pane_id(tab_id), style={'display': 'none'}) for tab_id in TAB_IDS],
+             id="tab-content", style={'padding': '20px', 'backgroundColor': colors['background'], 'borderRadius': '8px'}),
 
 ], fluid=True, style={'backgroundColor': colors['light_gray'], 'padding': '20px', 'fontFamily': 'Noto Sans Hebrew'})
 
+# --- Server routes ---
+@app.server.route('/cache-stats')
+def cache_stats():
+    """Hit/miss counters of the report aggregate cache."""
+    return jsonify({'ledger_version': active_ledger().version, **pivot_cache.stats()})
+
+@app.server.after_request
+def record_callback_response(response):
+    """Time Dash spent encoding an instrumented callback's result, and the response size."""
+    callback = g.pop('callback_name', None)
+    if callback is not None:
+        metrics.observe_response(callback, time.perf_counter() - g.pop('callback_done'),
+                                 response.calculate_content_length() or 0)
+    return response
+
+@app.server.route('/metrics')
+def prometheus_metrics():
+    """Callback timings, stage timings and payload sizes in the Prometheus text format."""
+    gauges = [
+        ('ledger_rows', 'Rows in the loaded ledgers.',
+         [({'version': ledger.version}, len(ledger.frame)) for _, ledger in resident_ledgers.items()]),
+        ('report_cache_entries', 'Entries held by the report caches.',
+         [({'cache': 'pivot'}, pivot_cache.stats()['size']), ({'cache': 'raw_page'}, raw_page_cache.stats()['size'])]),
+        ('report_cache_hit_rate', 'Hit rate of the report caches.',
+         [({'cache': 'pivot'}, pivot_cache.stats()['hit_rate']),
+          ({'cache': 'raw_page'}, raw_page_cache.stats()['hit_rate'])]),
+    ]
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
 # --- Callbacks ---
+# Every server-side callback is wrapped by `instrumented`: its duration and stage() timings go to
+# /metrics, and with PROFILE_DIR set a request carrying the PROFILE_HEADER header gets a cProfile dump
+metrics = MetricsRegistry()
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
+PROFILE_HEADER = 'X-Debug-Profile'
+
+def profile_dir_for_request():
+    if PROFILE_DIR and has_request_context() and request.headers.get(PROFILE_HEADER):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        return PROFILE_DIR
+    return None
+
+def mark_callback_done(callback):
+    # Read by record_callback_response to time the JSON encoding that follows the callback
+    if has_request_context():
+        g.callback_name = callback
+        g.callback_done = time.perf_counter()
+
+def instrumented(callback):
+    return metrics.instrument(callback, profile=profile_dir_for_request, on_exit=mark_callback_done)
+
 @app.callback(
-    Output("tab-content", "children"),
+    [Output('company-selector', 'options'),
+     Output('company-selector', 'value'),
+     Output('year-selector', 'options'),
+     Output('year-selector', 'value'),
+     Output('page-location', 'href')],
+    [Input('company-selector', 'value'),
+     Input('year-selector', 'value')]
+)
+@instrumented('select_partition')
+def select_partition(company, year):
+    """
+    Fills the selectors with the stored partitions and marks the active one. A
+    new selection goes to PARTITION_COOKIE and the page is reloaded, so every
+    report, store and background job starts over in the selected partition.
+    """
+    if LEDGER_PARTITIONS:
+        # Partitions stored since this process started
+        refresh_partitions()
+    current = active_partition()
+    if current is None:
+        return [], None, [], None, no_update
+    if company is None or year is None or latest_partition(company) is None:
+        company, year = current
+    elif (company, year) not in available_partitions:
+        # Another company: its latest year
+        company, year = latest_partition(company)
+    companies = sorted({name for name, _ in available_partitions})
+    years = [partition_year for name, partition_year in available_partitions if name == company]
+    href = no_update
+    if (company, year) != current:
+        ctx.response.set_cookie(PARTITION_COOKIE, quote(json.dumps([company, year])), max_age=365 * 24 * 3600,
+                                samesite='Lax')
+        # A different URL, so dcc.Location reloads the page
+        href = '?' + urlencode({'ledger': f'{company}/{year}'})
+    return ([{'label': name, 'value': name} for name in companies], company,
+            [{'label': str(partition_year), 'value': partition_year} for partition_year in years], year, href)
+
+# Showing a tab is a pure client-side style switch - no server round-trip
+app.clientside_callback(
+    """
+    function(activeTab) {
+        return %s.map(function(tabId) {
+            return {display: tabId === activeTab ? 'block' : 'none'};
+        });
+    }
+    """ % json.dumps(TAB_IDS),
+    [Output(tab_pane_id(tab_id), "style") for tab_id in TAB_IDS],
     Input("tabs", "active_tab")
 )
+
+@app.callback(
+    [Output(tab_pane_id(tab_id), "children") for tab_id in TAB_IDS]
+    + [Output("rendered-tabs", "data")],
+    Input("tabs", "active_tab"),
+    State("rendered-tabs", "data")
+)
+@instrumented('render_active_tab')
+def render_active_tab(active_tab, rendered_tabs):
+    """
+    Builds the active tab's components on its first visit in this session;
+    panes that were already built are left untouched.
+    """
+    rendered_tabs = rendered_tabs or []
+    if active_tab not in TAB_IDS or active_tab in rendered_tabs:
+        return [no_update] * (len(TAB_IDS) + 1)
+    children = [render_tab_content(tab_id) if tab_id == active_tab else no_update for tab_id in TAB_IDS]
+    return children + [rendered_tabs + [active_tab]]
+
 def render_tab_content(active_tab):
     if active_tab == "hierarchical-report-tab":
         return html.Div([
@@ -166,7 +684,8 @@ def render_tab_content(active_tab):
                         id='hierarchy-level-radio',
                         options=[
                             {'label': 'פירוט לפי קוד מיון (סיכום)', 'value': 'קוד מיון'},
-                            {'label': 'פירוט מלא (קוד מיון + חשבון)', 'value': 'קוד מיון + חשבון'}
+                            {'label': 'פירוט מלא (קוד מיון + חשבון)', 'value': 'קוד מיון + חשבון'},
+                            {'label': 'עץ נפתח (לחיצה על קוד מיון)', 'value': TREE_LEVEL}
                         ],
                         value='קוד מיון + חשבון', # Default value
                         inline=True,
@@ -177,7 +696,12 @@ def render_tab_content(active_tab):
                 dbc.Col(
                     dbc.Checklist(
                         id='show-quarters-checklist',
-                        options=[{'label': 'הצג רבעונים', 'value': 'show'}],
+                        options=[
+                            {'label': 'הצג רבעונים', 'value': 'show'},
+                            {'label': 'חציונים', 'value': 'half'},
+                            {'label': 'מתחילת השנה', 'value': 'ytd'},
+                            {'label': '12 חודשים אחרונים', 'value': 'rolling12'},
+                        ],
                         value=['show'], # Default to showing quarters
                         inline=True,
                         className="mb-3",
@@ -185,6 +709,10 @@ def render_tab_content(active_tab):
                     ), width=6
                 )
             ], justify="end"),
+            # Progress of a background build of this report (see report_job_step)
+            html.Div(id='hierarchical-job-status'),
+            dcc.Store(id='hierarchical-job'),
+            dcc.Interval(id='hierarchical-job-poll', interval=500, disabled=True),
             dash_table.DataTable(
                 id='hierarchical-table',
                 style_table={
@@ -218,8 +746,70 @@ def render_tab_content(active_tab):
                 ],
                 sort_action="native",
                 filter_action="native",
-                tooltip_delay=0,
-                tooltip_duration=None,
+            )
+        ])
+    elif active_tab == "pnl-tab":
+        return html.Div([
+            html.H3("דוח רווח והפסד", style={'textAlign': 'right', 'color': colors['dark_gray'], 'fontFamily': 'Assistant', 'marginBottom': '20px'}),
+            dbc.Row([
+                dbc.Col(
+                    dbc.Checklist(
+                        id='pnl-periods-checklist',
+                        options=[
+                            {'label': 'הצג רבעונים', 'value': 'show'},
+                            {'label': 'חציונים', 'value': 'half'},
+                            {'label': 'מתחילת השנה', 'value': 'ytd'},
+                            {'label': '12 חודשים אחרונים', 'value': 'rolling12'},
+                        ],
+                        value=['show'],
+                        inline=True,
+                        className="mb-3",
+                        style={'textAlign': 'right', 'direction': 'rtl', 'fontFamily': 'Noto Sans Hebrew', 'color': colors['dark_gray']}
+                    ), width=6
+                )
+            ], justify="end"),
+            dash_table.DataTable(
+                id='pnl-table',
+                # Statement lines keep their order - no sorting or filtering
+                style_table={
+                    'overflowX': 'auto',
+                    'direction': 'rtl',
+                    'boxShadow': '3px 3px 10px rgba(0,0,0,0.1)',
+                    'borderRadius': '8px',
+                },
+                style_cell={
+                    'fontFamily': 'Noto Sans Hebrew',
+                    'textAlign': 'right',
+                    'padding': '10px',
+                    'border': f'1px solid {colors["medium_gray"]}',
+                    'whiteSpace': 'normal',
+                    'height': 'auto',
+                    'minWidth': '100px', 'width': '100px', 'maxWidth': '100px',
+                    'color': colors['text']
+                },
+                style_header={
+                    'backgroundColor': colors['primary_green'],
+                    'color': 'white',
+                    'fontWeight': 'bold',
+                    'textAlign': 'right',
+                    'fontFamily': 'Assistant',
+                    'fontSize': '16px',
+                    'border': f'1px solid {colors["medium_gray"]}'
+                },
+            ),
+            html.H5("מלאי פתיחה וסגירה (מתואם לעלות המכר)", style={'textAlign': 'right', 'color': colors['dark_gray'], 'fontFamily': 'Assistant', 'marginTop': '30px'}),
+            dcc.Store(id='inventory-version', data=refresh_inventory().version),
+            dash_table.DataTable(
+                id='inventory-table',
+                columns=[{'name': 'חודש', 'id': 'חודש', 'editable': False}]
+                        + [{'name': col, 'id': col, 'type': 'numeric', 'editable': True, 'format': NUMBER_FORMAT}
+                           for col in INVENTORY_COLUMNS],
+                data=inventory_records(refresh_inventory()),
+                style_table={'direction': 'rtl', 'maxWidth': '600px'},
+                style_cell={'fontFamily': 'Noto Sans Hebrew', 'textAlign': 'right', 'padding': '6px',
+                            'border': f'1px solid {colors["medium_gray"]}'},
+                style_header={'backgroundColor': colors['sub_header_bg'], 'color': 'white', 'fontWeight': 'bold',
+                              'textAlign': 'right', 'fontFamily': 'Assistant'},
             )
         ])
     elif active_tab == "pivot-tab":
@@ -236,13 +826,16 @@ def render_tab_content(active_tab):
                                 {'label': 'לפי חשבון בלבד', 'value': 'חשבון'},
                                 {'label': 'לפי קוד מיון ואז חשבון', 'value': 'קוד מיון, חשבון'}
                             ],
-                            value='קוד מיון, חשבון', # Default value
+                            value=DEFAULT_PIVOT_ROW_LEVEL, # Default value
                             clearable=False,
                             style={'fontFamily': 'Noto Sans Hebrew', 'direction': 'rtl'}
                         )
                     ]), width=6
                 )
             ], justify="end", className="mb-3"),
+            html.Div(id='pivot-job-status'),
+            dcc.Store(id='pivot-job'),
+            dcc.Interval(id='pivot-job-poll', interval=500, disabled=True),
             dash_table.DataTable(
                 id='pivot-table',
                 style_table={
@@ -276,8 +869,6 @@ def render_tab_content(active_tab):
                 ],
                 sort_action="native",
                 filter_action="native",
-                tooltip_delay=0,
-                tooltip_duration=None,
             )
         ])
     elif active_tab == "monthly-quarterly-interactive-tab":
@@ -290,8 +881,8 @@ def render_tab_content(active_tab):
             html.H3("תנועות גולמיות", style={'textAlign': 'right', 'color': colors['dark_gray'], 'fontFamily': 'Assistant', 'marginBottom': '20px'}),
             dash_table.DataTable(
                 id='raw-data-table',
-                data=df_full.to_dict('records'),
-                columns=[{"name": i, "id": i} for i in df_full.columns],
+                # הנתונים נטענים עמוד אחר עמוד ע"י update_raw_data_table
+                columns=[{"name": i, "id": i} for i in active_ledger().frame.columns],
                 style_table={
                     'overflowX': 'auto',
                     'direction': 'rtl',
@@ -321,282 +912,800 @@ def render_tab_content(active_tab):
                 style_data_conditional=[
                     {'if': {'row_index': 'odd'}, 'backgroundColor': colors['light_gray']} # Zebra stripes
                 ],
-                sort_action="native",
-                filter_action="native",
-                page_action="native",
-                page_size=10,
+                sort_action="custom",
+                sort_mode="multi",
+                sort_by=[],
+                filter_action="custom",
+                filter_query='',
+                page_action="custom",
+                page_current=0,
+                page_size=RAW_PAGE_SIZE,
             )
         ])
     return html.Div("בחר טאב")
 
+def hierarchical_frame_key(group_level, period_kinds, search=''):
+    return (active_ledger().version, 'hierarchical', group_level, tuple(period_kinds), (search or '').strip())
+
+def cached_hierarchical_frame(group_level, period_kinds, search=''):
+    search = (search or '').strip()
+    period_kinds = tuple(period_kinds)
+    return pivot_cache.get_or_compute(
+        hierarchical_frame_key(group_level, period_kinds, search),
+        lambda: build_hierarchical_frame(search_cube(search), group_level, period_kinds)
+    )
+
+def cached_tree_children(category, period_kinds, search=''):
+    """Account rows under one category node of the tree, built from the (search) cube on first expand."""
+    search = (search or '').strip()
+    period_kinds = tuple(period_kinds)
+    return pivot_cache.get_or_compute(
+        (active_ledger().version, 'tree-children', category, period_kinds, search),
+        lambda: build_report_frame(search_cube(search), ['קוד מיון', 'חשבון'], period_kinds, categories=[category])
+    )
+
+def build_vendor_frame(category, account, period_kinds, search=''):
+    """
+    'ספק' rows of one (קוד מיון, חשבון) pair: the pair's ledger lines come from
+    the drill-down index, already tagged with their month column, and are summed
+    per (vendor code, month) with one bincount.
+    """
+    ledger = active_ledger()
+    cube = search_cube(search)
+    positions, month_columns = ledger.drilldown_index.rows_by_month([category], [account])
+    mask = search_mask(search)
+    if mask is not None:
+        keep = mask[positions]
+        positions, month_columns = positions[keep], month_columns[keep]
+
+    # drilldown_index.cube month columns -> the (search) cube's columns
+    columns = {entry: i for i, entry in enumerate(zip(cube.axis, cube.month_names))}
+    full_cube = ledger.drilldown_index.cube
+    column_map = np.array([columns.get(entry, -1) for entry in zip(full_cube.axis, full_cube.month_names)],
+                          dtype=np.int64)
+
+    vendors = ledger.frame[VENDOR_COLUMN].array
+    vendor_codes, rows = np.unique(vendors.codes[positions], return_inverse=True)
+    n_months = len(cube.months)
+    matrix = np.bincount(rows.reshape(-1) * n_months + column_map[month_columns],
+                         weights=ledger.frame['סכום'].to_numpy(dtype=np.float64)[positions],
+                         minlength=len(vendor_codes) * n_months).reshape(len(vendor_codes), n_months)
+
+    labels = np.append(np.asarray(vendors.categories, dtype=object), NO_VENDOR)[vendor_codes]
+    frame = pd.DataFrame({'קוד מיון': category, 'חשבון': account, VENDOR_COLUMN: labels})
+    frame = pd.concat([frame, pd.DataFrame(matrix, columns=cube.months)], axis=1)
+    return finish_report_frame(frame, cube, period_kinds)
+
+def cached_tree_vendors(category, account, period_kinds, search=''):
+    """Vendor rows under one account node of the tree."""
+    search = (search or '').strip()
+    period_kinds = tuple(period_kinds)
+    return pivot_cache.get_or_compute(
+        (active_ledger().version, 'tree-vendors', category, account, period_kinds, search),
+        lambda: build_vendor_frame(category, account, period_kinds, search)
+    )
+
+def has_vendor_level():
+    return VENDOR_COLUMN in active_ledger().frame.columns
+
+def tree_node_row(row_id, period_kinds, search=''):
+    """
+    Report row behind a tree row id: ``n`` is row n of the category frame,
+    ``"n:m"`` account row m of category row n and ``"n:m:k"`` vendor row k of that account.
+    """
+    categories_frame, _ = cached_hierarchical_frame('קוד מיון', period_kinds, search)
+    if not isinstance(row_id, str):
+        return categories_frame.iloc[row_id].to_dict()
+    path = [int(part) for part in row_id.split(':')]
+    category = categories_frame['קוד מיון'].iloc[path[0]]
+    children, _ = cached_tree_children(category, period_kinds, search)
+    if len(path) == 2:
+        return children.iloc[path[1]].to_dict()
+    vendors, _ = cached_tree_vendors(category, children['חשבון'].iloc[path[1]], period_kinds, search)
+    return vendors.iloc[path[2]].to_dict()
+
+def tree_node_label(label, expanded):
+    return f"{TREE_EXPANDED if expanded else TREE_COLLAPSED} {label}"
+
+def tree_records(period_kinds, search='', expanded=()):
+    """
+    DataTable rows of the tree: every category (and the total row), each
+    expanded category followed by its account rows and each expanded account
+    by its vendor rows. ``expanded`` holds [category] / [category, account] paths.
+    """
+    categories_frame, _ = cached_hierarchical_frame('קוד מיון', period_kinds, search)
+    expanded = {tuple(path) for path in expanded}
+    vendor_level = has_vendor_level()
+    records = []
+    for position, record in enumerate(categories_frame.to_dict('records')):
+        record['id'] = position
+        if record['סוג'] == TOTAL_ROW_MARKER:
+            records.append(record)
+            continue
+        category = record['קוד מיון']
+        record['חשבון'] = ''
+        record['קוד מיון'] = tree_node_label(category, (category,) in expanded)
+        records.append(record)
+        if (category,) not in expanded:
+            continue
+        children, _ = cached_tree_children(category, period_kinds, search)
+        for child_position, child in enumerate(children.to_dict('records')):
+            child['id'] = f'{position}:{child_position}'
+            child['קוד מיון'] = ''
+            account = child['חשבון']
+            if vendor_level:
+                child['חשבון'] = tree_node_label(account, (category, account) in expanded)
+            records.append(child)
+            if (category, account) not in expanded:
+                continue
+            vendors, _ = cached_tree_vendors(category, account, period_kinds, search)
+            for vendor_position, vendor in enumerate(vendors.to_dict('records')):
+                vendor['id'] = f'{position}:{child_position}:{vendor_position}'
+                vendor['קוד מיון'] = vendor['חשבון'] = ''
+                records.append(vendor)
+    return records
+
+
+# --- Background report jobs ---
+# A report callback whose view is not cached submits its build to report_jobs and
+# returns at once; the report's *-job-poll interval then re-runs the callback, which
+# shows the job's progress and renders the table once the result is cached.
+
+def report_job(progress, key, build, *args):
+    """
+    Job body (runs in a report_jobs process): ``build(cube, *args)`` on the cube
+    of the search text in ``key``. Returns the (key, value) cache entries for the
+    web process - the report frame, and the search cube for later drill-downs.
+    """
+    version, search = key[0], key[-1]
+    if version != active_ledger().version:
+        raise RuntimeError('the ledger changed since the job was submitted')
+    progress(0.1, 'מסנן תנועות')
+    cube = search_cube(search)
+    progress(0.5, 'מחשב סיכומים')
+    entries = [(key, build(cube, *args))]
+    if search:
+        entries.append(((version, 'search-cube', search), cube))
+    return entries
+
+def partition_job(progress, partition, func, *args):
+    """Runs the job ``func`` in the partition of the request that submitted it."""
+    return run_in_partition(partition, func, progress, *args)
+
+def use_report_jobs():
+    """Direct calls (warm-up, prefetch, benchmarks) have no request and always build in-process."""
+    return has_request_context() and len(active_ledger().frame) >= REPORT_JOB_MIN_ROWS
+
+def triggered_by(component_id):
+    return has_request_context() and ctx.triggered_id == component_id
+
+def job_progress_bar(status):
+    percent = int(round(status['progress'] * 100))
+    return dbc.Progress(value=percent, label=status['message'] or f'{percent}%', striped=True, animated=True,
+                        color='success', className='mb-2', style={'height': '20px', 'direction': 'ltr'})
+
+def report_job_step(key, job, polled, build, *args):
+    """
+    Background-job side of a report callback showing the view cached under ``key``.
+
+    ``job`` is the report's *-job store ({'id', 'key'}), ``polled`` tells an
+    interval tick from a parameter change. A job for other parameters (or an
+    older ledger) is cancelled: it was superseded. Returns (ready, outputs):
+    ready when the view can be rendered in-process now, outputs being the new
+    job store, the poll interval's ``disabled`` flag and the status children.
+    """
+    token = json.dumps(key, ensure_ascii=False)
+    if job and job.get('key') == token:
+        status = report_jobs.status(job['id'])
+        if status['state'] == JOB_DONE:
+            for entry_key, value in report_jobs.result(job['id']):
+                pivot_cache.put(entry_key, value)
+            return True, (None, True, None)
+        if status['state'] == JOB_FAILED:
+            report_jobs.discard(job['id'])
+            return False, (None, True, f"שגיאה בחישוב הדוח: {status['message']}")
+        if status['state'] != JOB_CANCELLED:
+            return False, (no_update, False, job_progress_bar(status))
+        # Cancelled by a ledger reload - submitted again below
+        report_jobs.discard(job['id'])
+    elif job:
+        report_jobs.cancel(job['id'])
+    elif polled:
+        # A tick that was already queued when the finished job disabled the interval
+        return False, (no_update, True, no_update)
+
+    if key in pivot_cache or not use_report_jobs():
+        return True, (None, True, None)
+    job_id = report_jobs.submit(partition_job, active_partition(), report_job, key, build, *args)
+    return False, ({'id': job_id, 'key': token}, False, job_progress_bar(report_jobs.status(job_id)))
+
+
 # Callback for Hierarchical Report
 @app.callback(
     [Output('hierarchical-table', 'columns'),
      Output('hierarchical-table', 'data'),
-     Output('hierarchical-table', 'tooltip_data'),
-     Output('hierarchical-table', 'style_data_conditional')],
+     Output('hierarchical-table', 'style_data_conditional'),
+     Output('hierarchical-params', 'data'),
+     Output('hierarchical-job', 'data'),
+     Output('hierarchical-job-poll', 'disabled'),
+     Output('hierarchical-job-status', 'children')],
     [Input('hierarchy-level-radio', 'value'),
-     Input('show-quarters-checklist', 'value')]
+     Input('show-quarters-checklist', 'value'),
+     Input('search-bar', 'value'),
+     Input('hierarchical-job-poll', 'n_intervals')],
+    State('hierarchical-job', 'data')
 )
-def update_hierarchical_table(group_level, show_quarters):
-    display_quarters = 'show' in (show_quarters or [])
-    
-    df_display, value_cols = prepare_data_for_display(df_full, group_level, display_quarters)
+@instrumented('update_hierarchical_table')
+def update_hierarchical_table(group_level, show_quarters, search='', n_intervals=None, job=None):
+    period_kinds = period_kinds_from_options(show_quarters)
+    # The tree starts from the category rows - accounts are fetched when a node is expanded
+    frame_level = 'קוד מיון' if group_level == TREE_LEVEL else group_level
 
-    # Define columns for Dash DataTable
-    if group_level == 'קוד מיון':
-        header_cols = ['קוד מיון']
-    elif group_level == 'חשבון':
-        header_cols = ['חשבון']
-    else: # 'קוד מיון + חשבון'
-        header_cols = ['קוד מיון', 'חשבון']
-
-    columns = [{"name": i, "id": i} for i in header_cols + value_cols]
-
-    # Prepare tooltip data
-    tooltip_data = [
-        {
-            col: {'value': f"{val:,.0f}", 'type': 'markdown'} if isinstance(val, (int, float)) else str(val)
-            for col, val in row.items() if col in df_display.columns
-        }
-        for row in df_display.to_dict('records')
-    ]
-    
-    # Conditional formatting for coloring rows/cells
-    style_data_conditional = []
-    # Zebra stripes
-    style_data_conditional.append({'if': {'row_index': 'odd'}, 'backgroundColor': colors['light_gray']})
-
-    for i in range(len(df_display)):
-        row_type = df_display.iloc[i]['סוג']
-        is_income = row_type == 'הכנסות'
-        is_expense = row_type == 'הוצאות'
-        
-        # Apply row background color based on type
-        row_bg_color = colors['income_color'] if is_income else (colors['expense_color'] if is_expense else colors['background'])
-        row_text_color = colors['text_income'] if is_income else (colors['text_expense'] if is_expense else colors['text'])
-
-        style_data_conditional.append({
-            'if': {'row_index': i},
-            'backgroundColor': row_bg_color,
-            'color': row_text_color,
-        })
-        
-        # Specific styling for hierarchy levels
-        if group_level == 'קוד מיון' and 'קוד מיון' in df_display.columns:
-             style_data_conditional.append({
-                'if': {'row_index': i, 'column_id': 'קוד מיון'},
-                'fontWeight': 'bold',
-                'fontSize': '15px'
-            })
-        elif group_level == 'קוד מיון + חשבון' and 'קוד מיון' in df_display.columns:
-            # Highlight parent category row if it's a category header
-            style_data_conditional.append({
-                'if': {'row_index': i, 'column_id': 'קוד מיון'},
-                'fontWeight': 'bold',
-                'fontSize': '15px'
-            })
-            style_data_conditional.append({
-                'if': {'row_index': i, 'column_id': 'חשבון'},
-                'paddingRight': '30px' # Indent sub-items
-            })
-        elif group_level == 'חשבון' and 'חשבון' in df_display.columns:
-            style_data_conditional.append({
-                'if': {'row_index': i, 'column_id': 'חשבון'},
-                'fontWeight': 'bold'
-            })
-
-
-        # Styling for numeric values
-        for col in value_cols:
-            if col in df_display.columns:
-                val = df_display.iloc[i][col]
-                if isinstance(val, (int, float)) and val < 0:
-                    style_data_conditional.append({
-                        'if': {'row_index': i, 'column_id': col},
-                        'color': colors['text_expense'] # Red for negative numbers
-                    })
-                # Total column styling
-                if col == 'סה"כ':
-                    style_data_conditional.append({
-                        'if': {'row_index': i, 'column_id': 'סה"כ'},
-                        'backgroundColor': colors['primary_green'] if not is_income and not is_expense else colors['sub_header_bg'],
-                        'color': 'white',
-                        'fontWeight': 'bold'
-                    })
-    
-    # Add a global total row at the end
-    total_row_data = {'קוד מיון': 'סה"כ כולל', 'חשבון': ''}
-    for col in value_cols:
-        if col in df_display.columns: # Check if column exists in df_display
-            total_row_data[col] = df_display[col].sum()
+    with stage('jobs'):
+        ready, job_outputs = report_job_step(
+            hierarchical_frame_key(frame_level, period_kinds, search), job, triggered_by('hierarchical-job-poll'),
+            build_hierarchical_frame, frame_level, tuple(period_kinds)
+        )
+    if not ready:
+        return (no_update,) * 4 + job_outputs
 
-    df_display_with_total = pd.concat([df_display, pd.DataFrame([total_row_data])], ignore_index=True)
+    with stage('aggregate'):
+        df_display, value_cols = cached_hierarchical_frame(frame_level, period_kinds, search)
 
-    # Style the total row
-    total_row_index = len(df_display_with_total) - 1
-    style_data_conditional.append({
-        'if': {'row_index': total_row_index},
-        'backgroundColor': colors['primary_green'],
-        'color': 'white',
-        'fontWeight': 'bold',
-        'fontSize': '16px'
-    })
+    with stage('styles'):
+        # Define columns for Dash DataTable - value columns are formatted client-side (#,##0)
+        index_levels = hierarchy_index(group_level)
+        if group_level == TREE_LEVEL and has_vendor_level():
+            index_levels = index_levels + [VENDOR_COLUMN]
+        columns = table_columns(index_levels, value_cols)
 
+        # Conditional formatting - a fixed set of filter_query rules, independent of row count
+        style_data_conditional = hierarchical_table_styles(colors, group_level, value_cols)
 
-    return columns, df_display_with_total.to_dict('records'), tooltip_data, style_data_conditional
+    params = {'group_level': group_level, 'period_kinds': period_kinds, 'search': search}
 
+    if not triggered_by('hierarchical-job-poll'):
+        # Only for views the user asked for - a finished job's poll tick is not a new view
+        prefetch_tab_data(search)
+
+    with stage('to_dict'):
+        if group_level == TREE_LEVEL:
+            params['expanded'] = []
+            records = tree_records(period_kinds, search)
+        else:
+            records = table_records(df_display)
+    return (columns, records, style_data_conditional, params) + job_outputs
+
+
+def is_tree_toggle(active_cell, params):
+    """True for a click on a node label of the tree (handled by toggle_tree_node, not the drill-down)."""
+    return (bool(params) and params.get('group_level') == TREE_LEVEL
+            and active_cell.get('column_id') in ('קוד מיון', 'חשבון'))
 
-# Callback for Pivot Table
 @app.callback(
-    [Output('pivot-table', 'columns'),
-     Output('pivot-table', 'data'),
-     Output('pivot-table', 'tooltip_data'),
-     Output('pivot-table', 'style_data_conditional')],
-    [Input('pivot-row-level-dropdown', 'value')]
+    [Output('hierarchical-table', 'data', allow_duplicate=True),
+     Output('hierarchical-params', 'data', allow_duplicate=True),
+     Output('hierarchical-table', 'active_cell')],
+    Input('hierarchical-table', 'active_cell'),
+    State('hierarchical-params', 'data'),
+    prevent_initial_call=True
 )
-def update_pivot_table(selected_row_level):
-    pivot_index_levels = [s.strip() for s in selected_row_level.split(',')]
-    
-    # יצירת טבלת פיבוט בסיסית
-    pivot_df = pd.pivot_table(
-        df_full,
-        values=['סכום'],
-        index=pivot_index_levels,
-        columns=['חודש'],
-        aggfunc='sum',
-        fill_value=0
-    )
+@instrumented('toggle_tree_node')
+def toggle_tree_node(active_cell, params):
+    """
+    Expands / collapses the clicked category (or, with a vendor level, account)
+    node. The active cell is cleared so the same node can be clicked again.
+    """
+    if not active_cell or active_cell.get('row_id') is None or not is_tree_toggle(active_cell, params):
+        return no_update, no_update, no_update
+    row_id = active_cell['row_id']
+    depth = 1 if isinstance(row_id, int) else len(str(row_id).split(':'))
+    if depth > (2 if has_vendor_level() else 1):
+        return no_update, no_update, None
+    with stage('aggregate'):
+        report_row = tree_node_row(row_id, params['period_kinds'], params.get('search'))
+    if report_row.get('סוג') == TOTAL_ROW_MARKER:
+        return no_update, no_update, None
+    node = [report_row['קוד מיון'], report_row['חשבון']][:depth]
+    expanded = [path for path in params.get('expanded', []) if path != node]
+    if len(expanded) == len(params.get('expanded', [])):
+        expanded.append(node)
+    with stage('to_dict'):
+        records = tree_records(params['period_kinds'], params.get('search'), expanded)
+    return records, {**params, 'expanded': expanded}, None
 
-    # הטיפול בשמות העמודות כדי לפתור את בעיית הרמות המרובות
-    if isinstance(pivot_df.columns, pd.MultiIndex):
-        # לוקחים רק את רמת ה-'חודש' מתוך ה-MultiIndex
-        present_months_in_data = [month for month in month_order if month in pivot_df.columns.get_level_values(1)]
-        
-        # יצירת מיפוי מהמבנה המקורי לשמות עמודות פשוטים
-        column_mapping = {col: col[1] for col in pivot_df.columns if col[1] in present_months_in_data}
-        
-        # שינוי שמות העמודות
-        pivot_df = pivot_df.rename(columns=column_mapping)
-        
-        # סידור העמודות לפי הסדר הרצוי
-        pivot_df = pivot_df[present_months_in_data]
-    else:
-        # במקרה שזה לא מבנה MultiIndex
-        present_months_in_data = [month for month in month_order if month in pivot_df.columns]
-        pivot_df = pivot_df[present_months_in_data]
 
-    # הוספת סיכומי רבעונים
-    quarter_cols = []
-    
-    q1_months = [m for m in ['ינואר', 'פברואר', 'מרץ'] if m in present_months_in_data]
-    if q1_months:
-        pivot_df['Q1/2025'] = pivot_df[q1_months].sum(axis=1)
-        quarter_cols.append('Q1/2025')
-    
-    q2_months = [m for m in ['אפריל', 'מאי', 'יוני'] if m in present_months_in_data]
-    if q2_months:
-        pivot_df['Q2/2025'] = pivot_df[q2_months].sum(axis=1)
-        quarter_cols.append('Q2/2025')
-    
-    # הוספת עמודת סה"כ
-    pivot_df['סה"כ'] = pivot_df[present_months_in_data + quarter_cols].sum(axis=1)
-    
-    # איפוס אינדקס
-    pivot_df = pivot_df.reset_index()
-
-    # קביעת סוג עבור צביעה
-    if 'קוד מיון' in pivot_df.columns:
-        pivot_df['סוג'] = pivot_df['קוד מיון'].apply(lambda x: 'הכנסות' if x == 'הכנסות' else 'הוצאות')
-    elif 'חשבון' in pivot_df.columns:
-        pivot_df['סוג'] = pivot_df['חשבון'].apply(
-            lambda x: 'הכנסות' if x in df_full[df_full['קוד מיון'] == 'הכנסות']['חשבון'].unique() else 'הוצאות'
-        )
-    else:
-        pivot_df['סוג'] = 'אחר'
-    
-    # המרת ערכי הוצאות לשליליים
-    for col in present_months_in_data + quarter_cols + ['סה"כ']:
-        if col in pivot_df.columns:
-            pivot_df.loc[pivot_df['סוג'] == 'הוצאות', col] = -pivot_df.loc[pivot_df['סוג'] == 'הוצאות', col]
+def build_pivot_frame(cube, pivot_index_levels):
+    """
+    Builds the pivot table frame (months, quarters, total column and total row) for the given row levels.
+    """
+    pivot_df, value_cols = build_report_frame(cube, pivot_index_levels, period_kinds=('quarter',))
 
     # הוספת שורת סיכום
-    total_row_data = {'סוג': 'סה"כ'}
+    total_row_data = {'סוג': TOTAL_ROW_MARKER}
     for index_col in pivot_index_levels:
         total_row_data[index_col] = 'סה"כ'
     
-    for col in pivot_df.columns:
-        if col not in pivot_index_levels and col != 'סוג':
-            total_row_data[col] = pivot_df[col].sum()
+    for col in value_cols:
+        total_row_data[col] = pivot_df[col].sum()
     
     pivot_df = pd.concat([pivot_df, pd.DataFrame([total_row_data])], ignore_index=True)
 
-    # הגדרת עמודות לטבלת Dash
-    columns = [{"name": i, "id": i} for i in pivot_df.columns if i != 'סוג']
+    return pivot_df
 
-    # הכנת נתוני tooltip
-    tooltip_data = [
-        {
-            column: {'value': f"{value:,.0f}", 'type': 'markdown'} if isinstance(value, (int, float)) else str(value)
-            for column, value in row.items() if column != 'סוג'
-        }
-        for row in pivot_df.to_dict('records')
-    ]
 
-    # עיצוב מותנה לטבלה
-    style_data_conditional = []
-    style_data_conditional.append({'if': {'row_index': 'odd'}, 'backgroundColor': colors['light_gray']})
-
-    for i in range(len(pivot_df)):
-        row_type = pivot_df.iloc[i]['סוג']
-        is_income = row_type == 'הכנסות'
-        is_expense = row_type == 'הוצאות'
-        is_total_row = row_type == 'סה"כ'
-
-        if is_total_row:
-            row_bg_color = colors['primary_green']
-            row_text_color = 'white'
-            font_weight = 'bold'
-            font_size = '16px'
-        else:
-            row_bg_color = colors['income_color'] if is_income else (colors['expense_color'] if is_expense else colors['background'])
-            row_text_color = colors['text_income'] if is_income else (colors['text_expense'] if is_expense else colors['text'])
-            font_weight = 'normal'
-            font_size = '14px'
-
-        style_data_conditional.append({
-            'if': {'row_index': i},
-            'backgroundColor': row_bg_color,
-            'color': row_text_color,
-            'fontWeight': font_weight,
-            'fontSize': font_size
-        })
-
-        if 'קוד מיון' in pivot_index_levels and 'חשבון' in pivot_index_levels and 'חשבון' in pivot_df.columns:
-            style_data_conditional.append({
-                'if': {'row_index': i, 'column_id': 'חשבון'},
-                'paddingRight': '30px'
-            })
-        
-        if 'קוד מיון' in pivot_index_levels and 'קוד מיון' in pivot_df.columns:
-            style_data_conditional.append({
-                'if': {'row_index': i, 'column_id': 'קוד מיון'},
-                'fontWeight': 'bold'
-            })
-
-        for col in [c for c in pivot_df.columns if c not in pivot_index_levels and c != 'סוג']:
-            val = pivot_df.iloc[i][col]
-            if isinstance(val, (int, float)) and val < 0 and not is_total_row:
-                style_data_conditional.append({
-                    'if': {'row_index': i, 'column_id': col},
-                    'color': colors['text_expense']
-                })
-            style_data_conditional.append({
-                'if': {'row_index': i, 'column_id': col},
-                'textAlign': 'left'
-            })
-
-    return columns, pivot_df.to_dict('records'), tooltip_data, style_data_conditional
+def pivot_row_levels(selected_row_level):
+    """
+    Row levels of the pivot table for a 'pivot-row-level-dropdown' value.
+    """
+    return [s.strip() for s in selected_row_level.split(',')]
+
+def pivot_frame_key(pivot_index_levels, search=''):
+    return (active_ledger().version, 'pivot', tuple(pivot_index_levels), (search or '').strip())
+
+def cached_pivot_frame(pivot_index_levels, search=''):
+    search = (search or '').strip()
+    return pivot_cache.get_or_compute(
+        pivot_frame_key(pivot_index_levels, search),
+        lambda: build_pivot_frame(search_cube(search), pivot_index_levels)
+    )
+
+
+def prefetch_views(search, with_pivot=True):
+    if with_pivot:
+        cached_pivot_frame(pivot_row_levels(DEFAULT_PIVOT_ROW_LEVEL), search)
+    cached_raw_page(0, RAW_PAGE_SIZE, [], '', search)
+
+def prefetch_tab_data(search=''):
+    """
+    Computes the pivot and raw tabs' opening views for ``search`` in the background,
+    so switching to them is a cache hit.
+
+    At most one prefetch per partition waits in the queue: a prefetch for an
+    older search that has not started yet is cancelled, and one for the same
+    search is not queued twice. Ledgers whose report views are built by
+    report_jobs get only the raw page: the pivot tab submits its own job under
+    the same cache key when it is opened, off this worker.
+    """
+    partition = active_partition()
+    search = (search or '').strip()
+    with_pivot = not use_report_jobs()
+    if with_pivot and pivot_frame_key(pivot_row_levels(DEFAULT_PIVOT_ROW_LEVEL), search) in pivot_cache:
+        return
+    with prefetch_lock:
+        previous = prefetches.get(partition)
+        if previous is not None and not previous[1].done():
+            if previous[0] == search:
+                return
+            previous[1].cancel()
+        future = prefetch_executor.submit(run_in_partition, partition, prefetch_views, search, with_pivot)
+        prefetches[partition] = (search, future)
+
+
+def table_records(frame):
+    """
+    DataTable rows for a report frame; 'id' is the row's position in the frame, so
+    active_cell['row_id'] identifies the clicked row even after native sorting/filtering.
+    """
+    records = frame.to_dict('records')
+    for position, record in enumerate(records):
+        record['id'] = position
+    return records
+
+def report_column_months(cube, column_id, period_kinds):
+    """
+    Month columns of drilldown_index.cube behind a report column of ``cube``
+    (None = all months: the total, or a label column).
+    """
+    if column_id in cube.months:
+        positions = [cube.months.index(column_id)]
+    else:
+        period_cols, period_map = period_matrix(cube.axis, period_kinds, default_year=DEFAULT_REPORT_YEAR)
+        if column_id not in period_cols or column_id == period_cols[-1]:
+            return None
+        positions = np.flatnonzero(period_map[:, period_cols.index(column_id)])
+    # The search cube may label and number its months differently from the full cube
+    full_cube = active_ledger().drilldown_index.cube
+    columns = {entry: i for i, entry in enumerate(zip(full_cube.axis, full_cube.month_names))}
+    return [columns[(cube.axis[i], cube.month_names[i])] for i in positions]
+
+def drilldown_rows(report_row, column_id, period_kinds, search=''):
+    """
+    Ledger positions behind one report cell: the report row's קוד מיון / חשבון labels
+    (the total row covers everything) and the clicked column's months.
+    """
+    ledger = active_ledger()
+    categories = accounts = None
+    if report_row.get('סוג') != TOTAL_ROW_MARKER:
+        if isinstance(report_row.get('קוד מיון'), str):
+            categories = [report_row['קוד מיון']]
+        if isinstance(report_row.get('חשבון'), str):
+            accounts = [report_row['חשבון']]
+    month_columns = report_column_months(search_cube(search), column_id, period_kinds)
+    positions = ledger.drilldown_index.rows(categories, accounts, month_columns)
+
+    if isinstance(report_row.get(VENDOR_COLUMN), str):
+        # Tree vendor row; NO_VENDOR is not a category, so get_indexer gives -1 - the code of missing values
+        vendors = ledger.frame[VENDOR_COLUMN].array
+        vendor_code = vendors.categories.get_indexer([report_row[VENDOR_COLUMN]])[0]
+        positions = positions[vendors.codes[positions] == vendor_code]
+
+    mask = search_mask(search)
+    return positions if mask is None else positions[mask[positions]]
+
+def drilldown_view(report_row, column_id, period_kinds, search=''):
+    """Outputs of the drill-down modal for a clicked report cell."""
+    frame = active_ledger().frame
+    with stage('lookup'):
+        positions = drilldown_rows(report_row, column_id, period_kinds, search)
+    with stage('to_dict'):
+        shown = frame.take(positions[:DRILLDOWN_MAX_ROWS])
+        records = shown.to_dict('records')
+
+    if report_row.get('סוג') == TOTAL_ROW_MARKER:
+        row_label = 'כל החשבונות'
+    else:
+        row_label = ' / '.join(str(report_row[level]) for level in ('קוד מיון', 'חשבון', VENDOR_COLUMN)
+                               if isinstance(report_row.get(level), str))
+    column_label = column_id if column_id not in ('קוד מיון', 'חשבון', VENDOR_COLUMN) else 'כל התקופות'
+    total = frame['סכום'].to_numpy()[positions].sum()
+    summary = f'{len(positions):,} תנועות, סה"כ {total:,.2f}'
+    if len(positions) > DRILLDOWN_MAX_ROWS:
+        summary += f' (מוצגות {DRILLDOWN_MAX_ROWS:,} הראשונות)'
+    columns = [{'name': col, 'id': col} for col in frame.columns]
+    return True, f'{row_label} - {column_label}', summary, columns, records
+
+DRILLDOWN_OUTPUTS = ['drilldown-modal.is_open', 'drilldown-title.children', 'drilldown-summary.children',
+                     'drilldown-table.columns', 'drilldown-table.data']
+
+# The drill-downs clear the clicked cell (like toggle_tree_node), so clicking it again reopens the modal
+@app.callback(
+    [Output(*output.split('.')) for output in DRILLDOWN_OUTPUTS]
+    + [Output('hierarchical-table', 'active_cell', allow_duplicate=True)],
+    Input('hierarchical-table', 'active_cell'),
+    State('hierarchical-params', 'data'),
+    prevent_initial_call=True
+)
+@instrumented('drilldown_hierarchical')
+def drilldown_hierarchical(active_cell, params):
+    if not active_cell or active_cell.get('row_id') is None or not params:
+        return [no_update] * (len(DRILLDOWN_OUTPUTS) + 1)
+    if params['group_level'] == TREE_LEVEL:
+        if is_tree_toggle(active_cell, params):
+            return [no_update] * (len(DRILLDOWN_OUTPUTS) + 1)
+        report_row = tree_node_row(active_cell['row_id'], params['period_kinds'], params.get('search'))
+    else:
+        df_display, _ = cached_hierarchical_frame(params['group_level'], params['period_kinds'], params.get('search'))
+        report_row = df_display.iloc[active_cell['row_id']].to_dict()
+    view = drilldown_view(report_row, active_cell['column_id'], params['period_kinds'], params.get('search'))
+    return view + (None,)
+
+@app.callback(
+    [Output(*output.split('.'), allow_duplicate=True) for output in DRILLDOWN_OUTPUTS]
+    + [Output('pivot-table', 'active_cell')],
+    Input('pivot-table', 'active_cell'),
+    State('pivot-params', 'data'),
+    prevent_initial_call=True
+)
+@instrumented('drilldown_pivot')
+def drilldown_pivot(active_cell, params):
+    if not active_cell or active_cell.get('row_id') is None or not params:
+        return [no_update] * (len(DRILLDOWN_OUTPUTS) + 1)
+    pivot_df = cached_pivot_frame(params['row_levels'], params.get('search'))
+    report_row = pivot_df.iloc[active_cell['row_id']].to_dict()
+    return drilldown_view(report_row, active_cell['column_id'], ('quarter',), params.get('search')) + (None,)
+
+
+# Callback for Pivot Table
+@app.callback(
+    [Output('pivot-table', 'columns'),
+     Output('pivot-table', 'data'),
+     Output('pivot-table', 'style_data_conditional'),
+     Output('pivot-params', 'data'),
+     Output('pivot-job', 'data'),
+     Output('pivot-job-poll', 'disabled'),
+     Output('pivot-job-status', 'children')],
+    [Input('pivot-row-level-dropdown', 'value'),
+     Input('search-bar', 'value'),
+     Input('pivot-job-poll', 'n_intervals')],
+    State('pivot-job', 'data')
+)
+@instrumented('update_pivot_table')
+def update_pivot_table(selected_row_level, search='', n_intervals=None, job=None):
+    pivot_index_levels = pivot_row_levels(selected_row_level)
+    with stage('jobs'):
+        ready, job_outputs = report_job_step(
+            pivot_frame_key(pivot_index_levels, search), job, triggered_by('pivot-job-poll'),
+            build_pivot_frame, pivot_index_levels
+        )
+    if not ready:
+        return (no_update,) * 4 + job_outputs
+
+    with stage('aggregate'):
+        pivot_df = cached_pivot_frame(pivot_index_levels, search)
+
+    with stage('styles'):
+        # הגדרת עמודות לטבלת Dash - עיצוב המספרים (#,##0) נעשה בדפדפן, בלי tooltip לכל תא
+        value_cols = [c for c in pivot_df.columns if c not in pivot_index_levels and c != 'סוג']
+        columns = table_columns(pivot_index_levels, value_cols)
+
+        # עיצוב מותנה לטבלה - כללי filter_query קבועים במקום כלל לכל שורה ותא
+        style_data_conditional = pivot_table_styles(colors, pivot_index_levels, value_cols)
+
+    params = {'row_levels': pivot_index_levels, 'search': search}
+    with stage('to_dict'):
+        records = table_records(pivot_df)
+    return (columns, records, style_data_conditional, params) + job_outputs
+
+def cached_raw_page(page_current, page_size, sort_by, filter_query, search=''):
+    search = (search or '').strip()
+    return raw_page_cache.get_or_compute(
+        (active_ledger().version, 'raw-page', page_current or 0, page_size, json.dumps(sort_by or []), filter_query or '', search),
+        lambda: query_page(search_rows(search), page_current, page_size, sort_by, filter_query)
+    )
+
+# Callback for Raw Data Table - server-side filter/sort/paging
+@app.callback(
+    [Output('raw-data-table', 'data'),
+     Output('raw-data-table', 'page_count'),
+     Output('raw-params', 'data')],
+    [Input('raw-data-table', 'page_current'),
+     Input('raw-data-table', 'page_size'),
+     Input('raw-data-table', 'sort_by'),
+     Input('raw-data-table', 'filter_query'),
+     Input('search-bar', 'value')]
+)
+@instrumented('update_raw_data_table')
+def update_raw_data_table(page_current, page_size, sort_by, filter_query, search=''):
+    with stage('query'):
+        records, page_count = cached_raw_page(page_current, page_size, sort_by, filter_query, search)
+    return records, page_count, {'sort_by': sort_by, 'filter_query': filter_query, 'search': search}
+
+# Opening / closing inventory backup (inventory_backup_*.json format) applied to COGS; unset: no adjustment.
+# Partitions keep theirs in the partition directory (ledger.partitions.INVENTORY_FILE).
+INVENTORY_JSON = os.environ.get('INVENTORY_JSON')
+INVENTORY_COLUMNS = ('מלאי פתיחה', 'מלאי סגירה')
+
+# Current inventory and the mtime of the file it was read from, by partition
+inventories = {}
+inventory_mtimes = {}
+inventory_lock = threading.Lock()
+
+def inventory_path():
+    """Inventory backup file of the active partition (None: not persisted)."""
+    partition = active_partition()
+    if partition is None:
+        return INVENTORY_JSON
+    return os.path.join(partition_path(LEDGER_PARTITIONS, *partition), INVENTORY_FILE)
+
+def empty_inventory():
+    partition = active_partition()
+    return Inventory(year=partition[1] if partition else DEFAULT_REPORT_YEAR)
+
+def patch_pnl_frame(value, cube, period_kinds, old_inventory, new_inventory):
+    """
+    A cached P&L statement re-based from ``old_inventory`` to ``new_inventory``:
+    only the month (and period) columns whose COGS adjustment changed are updated.
+    """
+    frame, value_cols = value
+    delta = new_inventory.adjustment(cube.axis) - old_inventory.adjustment(cube.axis)
+    _, period_map = period_matrix(cube.axis, period_kinds, default_year=DEFAULT_REPORT_YEAR)
+    delta = np.concatenate([delta, delta @ period_map])
+    changed = [value_cols[i] for i in np.flatnonzero(delta)]
+    if not changed:
+        return value
+    frame = frame.copy()
+    frame[changed] = (frame[changed].to_numpy() + cogs_line_deltas(delta[delta != 0])).round(2)
+    return frame, value_cols
+
+def set_inventory(new_inventory, mtime=None):
+    """
+    Installs ``new_inventory`` for the active partition. Cached statements of the
+    previous inventory are patched and re-keyed instead of being rebuilt; other
+    aggregates are untouched.
+    """
+    partition = active_partition()
+    version = active_ledger().version
+    with inventory_lock:
+        old_inventory = inventories.get(partition) or empty_inventory()
+        inventories[partition], inventory_mtimes[partition] = new_inventory, mtime
+        if new_inventory.version == old_inventory.version:
+            return
+        for key, value in pivot_cache.items():
+            if key[:2] != (version, 'pnl') or key[4] != old_inventory.version:
+                continue
+            _, _, period_kinds, search, _ = key
+            patched = patch_pnl_frame(value, search_cube(search), period_kinds, old_inventory, new_inventory)
+            pivot_cache.put(key[:4] + (new_inventory.version,), patched)
+            pivot_cache.discard(key)
+
+def refresh_inventory():
+    """Returns the active partition's inventory, reloading its file if another process saved it."""
+    partition, path = active_partition(), inventory_path()
+    if path:
+        mtime = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+        if mtime != inventory_mtimes.get(partition):
+            set_inventory(load_inventory(path, year=empty_inventory().year), mtime)
+    return inventories.get(partition) or empty_inventory()
+
+def inventory_records(current):
+    """Rows of the inventory editor, one per month ('id' is the month number)."""
+    return [{'id': month, 'חודש': name,
+             INVENTORY_COLUMNS[0]: None if np.isnan(current.opening[month - 1]) else current.opening[month - 1],
+             INVENTORY_COLUMNS[1]: None if np.isnan(current.closing[month - 1]) else current.closing[month - 1]}
+            for month, name in enumerate(MONTH_NAMES, start=1)]
+
+def build_pnl_frame(cube, period_kinds=(), current_inventory=None):
+    """
+    P&L statement of ``cube``: one row per PNL_LINES entry, month and period
+    columns; subtotal lines carry the total-row marker in 'סוג'. COGS includes
+    the (opening - closing) change of ``current_inventory``.
+    """
+    with stage('reduce'):
+        cogs_adjustment = current_inventory.adjustment(cube.axis) if current_inventory else None
+        matrix = pnl_matrix(cube, active_ledger().category_sections, cogs_adjustment)
+    with stage('periods'):
+        period_cols, period_map = period_matrix(cube.axis, period_kinds, default_year=DEFAULT_REPORT_YEAR)
+        values = np.hstack([matrix, matrix @ period_map]).round(2)
+    value_cols = list(cube.months) + period_cols
+    frame = pd.DataFrame(values, columns=value_cols)
+    frame.insert(0, LINE_COLUMN, [label for label, _, _ in PNL_LINES])
+    frame['סוג'] = [TOTAL_ROW_MARKER if subtotal else (INCOME if max(line) > 0 else EXPENSE)
+                   for _, line, subtotal in PNL_LINES]
+    return frame, value_cols
+
+def cached_pnl_frame(period_kinds, search=''):
+    search = (search or '').strip()
+    period_kinds = tuple(period_kinds)
+    current_inventory = refresh_inventory()
+    return pivot_cache.get_or_compute(
+        (active_ledger().version, 'pnl', period_kinds, search, current_inventory.version),
+        lambda: build_pnl_frame(search_cube(search), period_kinds, current_inventory)
+    )
+
+# Callback for the P&L statement - recomputed from the (search) cube on every filter change
+@app.callback(
+    [Output('pnl-table', 'columns'),
+     Output('pnl-table', 'data'),
+     Output('pnl-table', 'style_data_conditional'),
+     Output('pnl-params', 'data')],
+    [Input('pnl-periods-checklist', 'value'),
+     Input('search-bar', 'value'),
+     Input('inventory-version', 'data')]
+)
+@instrumented('update_pnl_table')
+def update_pnl_table(show_periods, search='', inventory_version=None):
+    period_kinds = period_kinds_from_options(show_periods)
+    with stage('aggregate'):
+        frame, value_cols = cached_pnl_frame(period_kinds, search)
+    with stage('styles'):
+        columns = table_columns([LINE_COLUMN], value_cols)
+        style_data_conditional = pnl_table_styles(colors, LINE_COLUMN, value_cols)
+    with stage('to_dict'):
+        records = frame.to_dict('records')
+    return columns, records, style_data_conditional, {'period_kinds': list(period_kinds), 'search': search}
+
+def edited_value(value):
+    return np.nan if value is None or value == '' else float(value)
+
+@app.callback(
+    [Output('inventory-table', 'data'),
+     Output('inventory-version', 'data')],
+    Input('inventory-table', 'data_timestamp'),
+    State('inventory-table', 'data'),
+    prevent_initial_call=True
+)
+@instrumented('edit_inventory')
+def edit_inventory(_, rows):
+    """
+    Applies edited inventory cells (a closing value also becomes the next month's
+    opening value), saves the backup file and bumps the inventory version.
+    """
+    current = refresh_inventory()
+    edited = current
+    for row in rows or []:
+        month = row['id']
+        opening, closing = (edited_value(row.get(column)) for column in INVENTORY_COLUMNS)
+        # Compared with the values before this edit, so a carried-over opening value is not undone
+        changes = {}
+        if not np.array_equal(opening, current.opening[month - 1], equal_nan=True):
+            changes['opening'] = opening
+        if not np.array_equal(closing, current.closing[month - 1], equal_nan=True):
+            changes['closing'] = closing
+        if changes:
+            edited = edited.with_month(month, **changes)
+    if edited.version == current.version:
+        return no_update, no_update
+    mtime, path = None, inventory_path()
+    if path:
+        edited = save_inventory(edited, path)
+        mtime = os.stat(path).st_mtime_ns
+    set_inventory(edited, mtime)
+    return inventory_records(edited), edited.version
+
+# --- Excel export ---
+# Workbooks are built by report_jobs so the callback returns immediately;
+# export-poll checks the job until the file is ready for dcc.Download.
+EXPORT_DIR = tempfile.mkdtemp(prefix='pnl-export-')
+
+def export_source(active_tab, hierarchical_params, pivot_params, raw_params, pnl_params=None):
+    """
+    Returns (frame, columns, sheet name) for the report currently shown in ``active_tab``.
+    """
+    if active_tab == 'pnl-tab':
+        params = pnl_params or {'period_kinds': ['quarter']}
+        frame, value_cols = cached_pnl_frame(params['period_kinds'], params.get('search'))
+        return frame, [LINE_COLUMN] + value_cols, 'רווח והפסד'
+    if active_tab == 'pivot-tab':
+        levels = (pivot_params or {}).get('row_levels', ['קוד מיון', 'חשבון'])
+        frame = cached_pivot_frame(levels, pivot_params.get('search') if pivot_params else '')
+        return frame, report_export_columns(frame), 'Pivot חודשי'
+    if active_tab == 'raw-data-tab':
+        raw_params = raw_params or {}
+        frame = apply_query(search_rows(raw_params.get('search')), raw_params.get('sort_by'), raw_params.get('filter_query'))
+        return frame, list(frame.columns), 'תנועות גולמיות'
+    params = hierarchical_params or {'group_level': 'קוד מיון + חשבון', 'period_kinds': ['quarter']}
+    frame, value_cols = cached_hierarchical_frame(params['group_level'], params['period_kinds'], params.get('search'))
+    return frame, hierarchy_index(params['group_level']) + value_cols, 'דוח היררכי'
+
+def export_job(progress, active_tab, hierarchical_params, pivot_params, raw_params, pnl_params):
+    progress(0.1, 'מכין נתונים')
+    frame, columns, sheet_name = export_source(active_tab, hierarchical_params, pivot_params, raw_params, pnl_params)
+    progress(0.5, 'כותב קובץ')
+    path = os.path.join(EXPORT_DIR, f'{uuid.uuid4().hex}.xlsx')
+    write_frame_xlsx(path, frame, columns, colors, sheet_name)
+    return path, f"{sheet_name} {datetime.now():%Y-%m-%d %H%M}.xlsx"
+
+@app.callback(
+    [Output('export-download', 'data'),
+     Output('export-job', 'data'),
+     Output('export-poll', 'disabled'),
+     Output('export-status', 'children')],
+    [Input('export-button', 'n_clicks'),
+     Input('export-poll', 'n_intervals')],
+    [State('tabs', 'active_tab'),
+     State('hierarchical-params', 'data'),
+     State('pivot-params', 'data'),
+     State('raw-params', 'data'),
+     State('pnl-params', 'data'),
+     State('export-job', 'data')],
+    prevent_initial_call=True
+)
+@instrumented('export_report')
+def export_report(n_clicks, n_intervals, active_tab, hierarchical_params, pivot_params, raw_params, pnl_params, job_id):
+    if ctx.triggered_id == 'export-button':
+        if job_id:
+            # A second click supersedes the export still in progress
+            report_jobs.cancel(job_id)
+        job_id = report_jobs.submit(partition_job, active_partition(), export_job,
+                                    active_tab, hierarchical_params, pivot_params, raw_params, pnl_params)
+        return no_update, job_id, False, "מכין קובץ..."
+
+    if job_id is None:
+        return no_update, None, True, ""
+    status = report_jobs.status(job_id)
+    if status['state'] not in (JOB_DONE, JOB_FAILED, JOB_CANCELLED):
+        return no_update, no_update, no_update, f"מכין קובץ... {int(round(status['progress'] * 100))}%"
+    if status['state'] != JOB_DONE:
+        report_jobs.discard(job_id)
+        return no_update, None, True, f"שגיאה בייצוא: {status['message'] or 'הייצוא בוטל'}"
+    path, filename = report_jobs.result(job_id)
+    download = dcc.send_file(path, filename=filename)
+    os.remove(path)
+    return download, None, True, ""
+
+# --- Warm-up ---
+def warm_up():
+    """
+    Primes the aggregate cache with the default view of every report.
+    Called by wsgi.py before the server forks workers, so they inherit a warm cache.
+    """
+    for group_level in ('קוד מיון', 'קוד מיון + חשבון'):
+        cached_hierarchical_frame(group_level, ('quarter',))
+    for pivot_index_levels in (['קוד מיון'], ['חשבון'], ['קוד מיון', 'חשבון']):
+        cached_pivot_frame(pivot_index_levels)
 
+# Production: gunicorn -c gunicorn.conf.py (serves wsgi:server); this is the dev server only
 if __name__ == '__main__':
-    app.run_server(debug=True)
\ No newline at end of file
+    start_inbox_watcher()
+    app.run(debug=True)
\ No newline at end of file
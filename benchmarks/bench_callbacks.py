@@ -0,0 +1,196 @@
+"""
+Benchmark: the dashboard's report callbacks across synthetic ledger sizes.
+
+Loads each synthetic ledger into app.py (set_ledger) and calls the callback
+functions directly, with cold caches. Every stage records its best wall time,
+its peak traced memory and the JSON size of what it returns to the browser.
+Results are written as JSON and compared with a stored baseline; a stage that
+got slower, hungrier or bigger than the tolerance is flagged and the script
+exits with status 1.
+
+    python -m benchmarks.bench_callbacks --sizes 10000 100000 1000000
+    python -m benchmarks.bench_callbacks --sizes 10000 100000 --save-baseline
+
+results/callbacks-baseline.json is committed, recorded with the default
+arguments. Timings depend on the machine: a CI runner of a different speed
+should record its own baseline once (``--save-baseline`` with the default
+arguments), commit it, and run the script without arguments afterwards. A
+run without a baseline exits with status 2, so a missing file fails the
+check instead of passing it.
+"""
+
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from plotly.io.json import to_json_plotly
+
+from benchmarks.synthetic import make_ledger
+from ledger import drop_cancelling_entries
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+DEFAULT_OUTPUT = os.path.join(RESULTS_DIR, 'callbacks-latest.json')
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, 'callbacks-baseline.json')
+
+# (result field, label) compared against the baseline
+METRICS = (('seconds', 'time'), ('peak_mb', 'peak memory'), ('json_bytes', 'JSON size'))
+
+
+def stages(app, dataframe, search, entries):
+    """
+    (name, callable) for every measured stage; each callable returns what the stage
+    produces for the browser (None for load-time stages).
+    """
+    return [
+        ('drop_cancelling_entries', lambda: ingest_stage(drop_cancelling_entries, entries)),
+        ('set_ledger', lambda: app.set_ledger(dataframe)),
+        ('prepare_data_for_display',
+         lambda: app.prepare_data_for_display(app.active_ledger().cube, 'קוד מיון + חשבון', ('quarter',))[0].to_dict('records')),
+        ('update_hierarchical_table', lambda: app.update_hierarchical_table('קוד מיון + חשבון', ['show'], '')),
+        ('update_hierarchical_table (tree)', lambda: app.update_hierarchical_table(app.TREE_LEVEL, ['show'], '')),
+        ('update_pnl_table', lambda: app.update_pnl_table(['show', 'ytd'], '')),
+        ('update_pivot_table', lambda: app.update_pivot_table(app.DEFAULT_PIVOT_ROW_LEVEL, '')),
+        ('update_raw_data_table',
+         lambda: app.update_raw_data_table(0, app.RAW_PAGE_SIZE, [{'column_id': 'סכום', 'direction': 'desc'}], '', '')),
+        ('update_hierarchical_table (search)',
+         lambda: app.update_hierarchical_table('קוד מיון + חשבון', ['show'], search)),
+    ]
+
+
+def ingest_stage(func, dataframe):
+    """Runs a load-time stage; nothing of it goes to the browser."""
+    func(dataframe)
+
+
+def reset_caches(app):
+    """Waits for background prefetches, then empties the report caches so every stage runs cold."""
+    app.prefetch_executor.submit(lambda: None).result()
+    app.pivot_cache.clear()
+    app.raw_page_cache.clear()
+
+
+def json_size(output):
+    if output is None:
+        return None
+    return len(to_json_plotly(output).encode('utf-8'))
+
+
+def measure(app, func, repeat):
+    """Returns (best seconds, peak traced MB, JSON bytes) for ``func``."""
+    best = float('inf')
+    for _ in range(repeat):
+        reset_caches(app)
+        start = time.perf_counter()
+        output = func()
+        best = min(best, time.perf_counter() - start)
+
+    # Peak memory in a separate run - tracing slows allocation-heavy code down
+    reset_caches(app)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 2**20, json_size(output)
+
+
+def run(args):
+    import app
+
+    results = []
+    for n_rows in args.sizes:
+        dataframe = make_ledger(n_rows, n_accounts=args.accounts, n_categories=args.categories,
+                                n_months=args.months, seed=args.seed)
+        # Same ledger with journal-entry columns and reversed lines, for the ingestion stages
+        entries = make_ledger(n_rows, n_accounts=args.accounts, n_categories=args.categories,
+                              n_months=args.months, seed=args.seed, with_entries=True)
+        app.set_ledger(dataframe)
+        for name, func in stages(app, dataframe, args.search, entries):
+            seconds, peak_mb, json_bytes = measure(app, func, args.repeat)
+            results.append({'rows': n_rows, 'stage': name, 'seconds': seconds,
+                            'peak_mb': peak_mb, 'json_bytes': json_bytes})
+            json_text = '-' if json_bytes is None else f'{json_bytes / 1024:,.1f} KB'
+            print(f'{n_rows:>11,} {name:36s} {seconds * 1000:10.1f} ms {peak_mb:10.1f} MB {json_text:>14s}')
+    return results
+
+
+def compare(results, baseline, tolerance, min_seconds):
+    """Returns a message for every (rows, stage) metric worse than ``baseline`` by more than ``tolerance``."""
+    previous = {(row['rows'], row['stage']): row for row in baseline['results']}
+    regressions = []
+    for row in results:
+        before = previous.get((row['rows'], row['stage']))
+        if before is None:
+            continue
+        for field, label in METRICS:
+            old, new = before.get(field), row.get(field)
+            if old is None or new is None or new <= old * (1 + tolerance):
+                continue
+            if field == 'seconds' and new - old < min_seconds:
+                continue  # timer noise on very fast stages
+            regressions.append(f'{row["rows"]:,} rows / {row["stage"]}: {label} {old:,.4g} -> {new:,.4g} '
+                               f'(+{(new / old - 1) * 100 if old else float("inf"):.0f}%)')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='ledger row counts (10k - 10M)')
+    parser.add_argument('--accounts', type=int, default=4000)
+    parser.add_argument('--categories', type=int, default=12)
+    parser.add_argument('--months', type=int, default=24, help='more than 12 spans several years')
+    parser.add_argument('--search', default='חשבון 01', help='search bar text for the search stage')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown / growth')
+    parser.add_argument('--min-seconds', type=float, default=0.005,
+                        help='ignore time differences smaller than this')
+    args = parser.parse_args(argv)
+
+    print(f'{"rows":>11s} {"stage":36s} {"wall time":>13s} {"peak mem":>13s} {"JSON":>14s}')
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'numpy': np.__version__, 'pandas': pd.__version__},
+        'parameters': {'accounts': args.accounts, 'categories': args.categories, 'months': args.months,
+                       'search': args.search, 'repeat': args.repeat, 'seed': args.seed},
+        'results': run(args),
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as out:
+        json.dump(report, out, ensure_ascii=False, indent=2)
+    print(f'results written to {args.output}')
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as out:
+            json.dump(report, out, ensure_ascii=False, indent=2)
+        print(f'baseline saved to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'error: no baseline at {args.baseline} - record one with --save-baseline')
+        return 2
+    with open(args.baseline, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get('parameters') != report['parameters']:
+        print('warning: baseline was recorded with different parameters')
+    regressions = compare(report['results'], baseline, args.tolerance, args.min_seconds)
+    for message in regressions:
+        print(f'REGRESSION {message}')
+    if not regressions:
+        print(f'no regressions against {args.baseline} (tolerance {args.tolerance:.0%})')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
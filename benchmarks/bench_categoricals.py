@@ -0,0 +1,62 @@
+"""
+Benchmark: object-string vs categorical ledger columns.
+
+Reports memory use and the timing of the operations the dashboard runs on
+df_full: pivot_table, the 'הכנסות' equality mask, unique() and a groupby.
+
+    python -m benchmarks.bench_categoricals --rows 2000000 --accounts 4000
+"""
+
+import argparse
+import time
+
+from benchmarks.synthetic import make_ledger
+from ledger import MONTH_NAMES, categorize_ledger
+
+
+def timed(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def operations(df):
+    return {
+        'pivot_table': lambda: df.pivot_table(index=['קוד מיון', 'חשבון'], columns='חודש', values='סכום',
+                                              aggfunc='sum', fill_value=0, observed=True),
+        'income mask': lambda: df['קוד מיון'] == 'הכנסות',
+        'unique(חשבון)': lambda: df['חשבון'].unique(),
+        'groupby sum': lambda: df.groupby(['קוד מיון', 'חשבון', 'חודש'], observed=True)['סכום'].sum(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--accounts', type=int, default=4000)
+    args = parser.parse_args(argv)
+
+    plain = make_ledger(args.rows, n_accounts=args.accounts).astype(
+        {'חודש': object, 'קוד מיון': object, 'חשבון': object})
+    start = time.perf_counter()
+    encoded = categorize_ledger(plain, MONTH_NAMES)
+    encode_time = time.perf_counter() - start
+
+    plain_mb = plain.memory_usage(deep=True).sum() / 2**20
+    encoded_mb = encoded.memory_usage(deep=True).sum() / 2**20
+
+    print(f'rows={args.rows:,} accounts={args.accounts:,}')
+    print(f'memory                 object {plain_mb:9.1f} MB   categorical {encoded_mb:9.1f} MB')
+    print(f'encode (once)          {encode_time * 1000:10.1f} ms')
+    plain_ops, encoded_ops = operations(plain), operations(encoded)
+    for name in plain_ops:
+        before, after = timed(plain_ops[name]), timed(encoded_ops[name])
+        print(f'{name:22s} object {before * 1000:9.1f} ms   categorical {after * 1000:9.1f} ms'
+              f'   x{before / max(after, 1e-9):.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark: income/expense classification of a 'חשבון'-level pivot.
+
+Compares the old per-row ``apply`` (which re-filtered the ledger for every
+account) with the lookup built once by ledger.build_account_type_lookup.
+
+    python -m benchmarks.bench_classification --rows 2000000 --accounts 4000
+"""
+
+import argparse
+import time
+
+from benchmarks.synthetic import make_ledger
+from ledger import build_account_type_lookup, classify_rows
+
+
+def legacy_classify(pivot_df, dataframe):
+    return pivot_df['חשבון'].apply(
+        lambda x: 'הכנסות' if x in dataframe[dataframe['קוד מיון'] == 'הכנסות']['חשבון'].unique() else 'הוצאות'
+    )
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--accounts', type=int, default=4000)
+    parser.add_argument('--legacy-limit', type=int, default=200,
+                        help='accounts timed with the legacy apply (extrapolated to the full pivot)')
+    args = parser.parse_args(argv)
+
+    df = make_ledger(args.rows, n_accounts=args.accounts)
+    pivot_df, pivot_time = timed(
+        lambda: df.pivot_table(index='חשבון', columns='חודש', values='סכום', aggfunc='sum', fill_value=0).reset_index()
+    )
+
+    lookup, lookup_time = timed(build_account_type_lookup, df)
+    mapped, map_time = timed(classify_rows, pivot_df, lookup)
+
+    sample = pivot_df.head(args.legacy_limit)
+    legacy, legacy_time = timed(legacy_classify, sample, df)
+    assert (legacy.to_numpy() == mapped.head(len(sample)).to_numpy()).all(), 'classification mismatch'
+    legacy_full = legacy_time * len(pivot_df) / max(len(sample), 1)
+
+    print(f'rows={args.rows:,} accounts={len(pivot_df):,}')
+    print(f'pivot_table            {pivot_time * 1000:10.1f} ms')
+    print(f'lookup build (once)    {lookup_time * 1000:10.1f} ms')
+    print(f'classify via map       {map_time * 1000:10.1f} ms')
+    print(f'legacy apply (est.)    {legacy_full * 1000:10.1f} ms  ({len(sample)} accounts measured)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Synthetic ledger generator shared by the benchmark scripts.
+
+Produces frames with the same columns as df_full in app.py, with a
+configurable number of rows, accounts, categories and months.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ledger.dtypes import MONTH_NAMES as MONTHS
+
+FIRST_YEAR = 2024
+
+
+# Share of lines that reverse the line before them (with_entries=True)
+REVERSAL_SHARE = 0.02
+
+
+def make_ledger(n_rows, n_accounts=4000, n_categories=2, n_months=12, income_share=0.3, seed=0,
+                with_entries=False):
+    """
+    Returns a synthetic ledger with columns חודש / קוד מיון / חשבון / סכום.
+
+    The first category is always 'הכנסות' and owns roughly ``income_share`` of
+    the accounts; every account belongs to exactly one category. With more
+    than 12 months the ledger spans several years and gets a 'שנה' column
+    (starting at FIRST_YEAR).
+
+    ``with_entries`` adds the ERP columns the ingestion stages read
+    ('כותרת', 'מפתח חשבון', 'מספר קוד מיון', 'ח-ן נגדי'); about
+    REVERSAL_SHARE of the lines then cancel the line before them against the
+    suppliers account 37999.
+    """
+    rng = np.random.default_rng(seed)
+    categories = ['הכנסות', 'הוצאות'] + [f'קוד מיון {i}' for i in range(3, n_categories + 1)]
+    categories = categories[:max(n_categories, 1)]
+
+    accounts = np.array([f'חשבון {i:05d}' for i in range(n_accounts)], dtype=object)
+    n_income = max(1, int(n_accounts * income_share)) if n_categories > 1 else n_accounts
+    account_category = np.empty(n_accounts, dtype=np.int64)
+    account_category[:n_income] = 0
+    if n_accounts > n_income:
+        account_category[n_income:] = rng.integers(1, len(categories), n_accounts - n_income)
+
+    account_idx = rng.integers(0, n_accounts, n_rows)
+    month_idx = rng.integers(0, n_months, n_rows)
+    amounts = rng.gamma(2.0, 2500.0, n_rows).round(2)
+    if with_entries:
+        reversal = np.flatnonzero(rng.random(n_rows) < REVERSAL_SHARE)
+        reversal = reversal[reversal > 0]
+        account_idx[reversal] = account_idx[reversal - 1]
+        month_idx[reversal] = month_idx[reversal - 1]
+        amounts[reversal] = -amounts[reversal - 1]
+    ledger = pd.DataFrame({
+        'חודש': np.array(MONTHS, dtype=object)[month_idx % len(MONTHS)],
+        'קוד מיון': np.array(categories, dtype=object)[account_category[account_idx]],
+        'חשבון': accounts[account_idx],
+        'סכום': amounts,
+    })
+    if n_months > len(MONTHS):
+        ledger['שנה'] = (FIRST_YEAR + month_idx // len(MONTHS)).astype(np.int64)
+    if with_entries:
+        counter_accounts = rng.integers(2000, 2050, n_rows)
+        counter_accounts[reversal] = 37999
+        ledger['כותרת'] = pd.array(np.arange(1, n_rows + 1), dtype='Int64')
+        ledger['מפתח חשבון'] = pd.array(account_idx, dtype='Int64')
+        ledger['מספר קוד מיון'] = pd.array(600 + account_category[account_idx], dtype='Int16')
+        ledger['ח-ן נגדי'] = pd.array(counter_accounts, dtype='Int64')
+    return ledger
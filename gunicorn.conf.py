@@ -0,0 +1,32 @@
+"""
+gunicorn settings for the dashboard (see wsgi.py).
+
+Tunable through the environment: BIND, WEB_CONCURRENCY, GUNICORN_THREADS,
+GUNICORN_TIMEOUT.
+"""
+
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:server'
+bind = os.environ.get('BIND', '0.0.0.0:8050')
+
+# Load app (ledger, cube, warm cache) once in the master, then fork
+preload_app = True
+
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+
+def post_fork(server, worker):
+    # The LEDGER_INBOX watcher is a thread, so it is started per worker after the fork
+    # (with LEDGER_PARTITIONS, only the worker holding the ingestion lock polls)
+    from app import start_inbox_watcher
+    start_inbox_watcher()
+
+
+def when_ready(server):
+    from app import active_ledger, pivot_cache
+    server.log.info('ledger %s preloaded, %d cached aggregates', active_ledger().version, pivot_cache.stats()['size'])
@@ -0,0 +1,143 @@
+"""
+Data layer for the Dash P&L dashboard (app.py).
+
+Keeps the heavy pandas/NumPy work out of the callbacks so it can be reused
+and benchmarked without starting the Dash server.
+"""
+
+from ledger.cache import PivotCache, appended_version, dataset_version
+from ledger.cancelling import cancelling_entries, drop_cancelling_entries
+from ledger.classification import (
+    INCOME,
+    EXPENSE,
+    build_account_type_lookup,
+    classify_rows,
+    merge_account_types,
+    negate_expenses,
+)
+from ledger.columnar import open_columnar, store_ledger, write_columnar
+from ledger.cube import AggregationCube
+from ledger.drilldown import DrillDownIndex
+from ledger.dtypes import MONTH_NAMES, append_ledger_rows, categorize_ledger
+from ledger.ingest import BatchRejected, InboxWatcher, ingested_batches, new_entries, read_batch
+from ledger.inventory import Inventory, load_inventory, save_inventory
+from ledger.jobs import (
+    JOB_CANCELLED,
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_PENDING,
+    JOB_RUNNING,
+    JobCancelled,
+    JobQueue,
+)
+from ledger.loader import load_ledger
+from ledger.export import report_export_columns, write_frame_xlsx
+from ledger.metrics import MetricsRegistry, stage
+from ledger.partitions import (
+    INVENTORY_FILE,
+    LoadedLedger,
+    list_partitions,
+    open_partition,
+    partition_path,
+    partition_source,
+    write_partition,
+    write_partitions,
+)
+from ledger.periods import PERIOD_KINDS, period_kinds_from_options, period_matrix
+from ledger.pnl import (
+    LINE_COLUMN,
+    PNL_LINES,
+    build_category_codes,
+    build_category_sections,
+    category_sections,
+    cogs_line_deltas,
+    merge_category_codes,
+    pnl_matrix,
+)
+from ledger.raw_query import apply_query, filter_mask, query_page, query_positions
+from ledger.search import LedgerSearchIndex, TextIndex
+from ledger.styles import (
+    NUMBER_FORMAT,
+    TOTAL_ROW_MARKER,
+    hierarchical_table_styles,
+    pivot_table_styles,
+    pnl_table_styles,
+    table_columns,
+)
+from ledger.vendors import VENDOR_COLUMN, VendorMatcher, resolve_vendors
+
+__all__ = [
+    'PivotCache',
+    'appended_version',
+    'dataset_version',
+    'cancelling_entries',
+    'drop_cancelling_entries',
+    'INCOME',
+    'EXPENSE',
+    'build_account_type_lookup',
+    'classify_rows',
+    'merge_account_types',
+    'negate_expenses',
+    'open_columnar',
+    'store_ledger',
+    'write_columnar',
+    'AggregationCube',
+    'DrillDownIndex',
+    'MONTH_NAMES',
+    'append_ledger_rows',
+    'categorize_ledger',
+    'BatchRejected',
+    'InboxWatcher',
+    'ingested_batches',
+    'new_entries',
+    'read_batch',
+    'Inventory',
+    'load_inventory',
+    'save_inventory',
+    'JOB_CANCELLED',
+    'JOB_DONE',
+    'JOB_FAILED',
+    'JOB_PENDING',
+    'JOB_RUNNING',
+    'JobCancelled',
+    'JobQueue',
+    'load_ledger',
+    'report_export_columns',
+    'write_frame_xlsx',
+    'MetricsRegistry',
+    'stage',
+    'INVENTORY_FILE',
+    'LoadedLedger',
+    'list_partitions',
+    'open_partition',
+    'partition_path',
+    'partition_source',
+    'write_partition',
+    'write_partitions',
+    'PERIOD_KINDS',
+    'period_kinds_from_options',
+    'period_matrix',
+    'LINE_COLUMN',
+    'PNL_LINES',
+    'build_category_codes',
+    'build_category_sections',
+    'category_sections',
+    'cogs_line_deltas',
+    'merge_category_codes',
+    'pnl_matrix',
+    'apply_query',
+    'filter_mask',
+    'query_page',
+    'query_positions',
+    'LedgerSearchIndex',
+    'TextIndex',
+    'NUMBER_FORMAT',
+    'TOTAL_ROW_MARKER',
+    'hierarchical_table_styles',
+    'pivot_table_styles',
+    'pnl_table_styles',
+    'table_columns',
+    'VENDOR_COLUMN',
+    'VendorMatcher',
+    'resolve_vendors',
+]
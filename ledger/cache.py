@@ -0,0 +1,124 @@
+"""
+Bounded LRU cache for report aggregates.
+
+Keys start with the dataset version, so a reloaded ledger never serves stale
+pivots; ``clear()`` is still called on reload to release the old entries.
+Concurrent requests for the same missing key wait for the first computation
+instead of repeating it.
+"""
+
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+_MASK64 = (1 << 64) - 1
+
+
+def _row_hash_sum(dataframe):
+    row_hashes = pd.util.hash_pandas_object(dataframe, index=False).to_numpy()
+    return int(row_hashes.sum(dtype='uint64'))
+
+
+def dataset_version(dataframe):
+    """Returns a short content hash identifying ``dataframe``."""
+    digest = _row_hash_sum(dataframe) ^ (len(dataframe) << 1)
+    return f'{digest:016x}'
+
+
+def appended_version(version, n_rows, new_rows):
+    """
+    Returns the dataset_version of an ``n_rows`` ledger with ``version`` after
+    appending ``new_rows``, hashing only the new rows (the digest is a sum of
+    row hashes, so it extends incrementally).
+    """
+    total = ((int(version, 16) ^ (n_rows << 1)) + _row_hash_sum(new_rows)) & _MASK64
+    digest = total ^ ((n_rows + len(new_rows)) << 1)
+    return f'{digest:016x}'
+
+
+class PivotCache:
+    """Thread-safe LRU of computed aggregates with hit/miss counters."""
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for ``key``, calling ``compute()`` on a miss."""
+        while True:
+            with self._lock:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return self._data[key]
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Another request is already computing this key - wait for it and retry
+            pending.wait()
+
+        try:
+            value = compute()
+            with self._lock:
+                self._store(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.set()
+
+    def put(self, key, value):
+        """Stores a value computed elsewhere (e.g. carried over from a previous ledger version)."""
+        with self._lock:
+            self._store(key, value)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def after_fork(self):
+        """
+        Replaces the lock in a forked child process, where another thread of the
+        parent may have held it at fork time. The cached entries are kept.
+        """
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def discard(self, key):
+        """Drops ``key`` if it is cached."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def _store(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def items(self):
+        """Snapshot of the cached (key, value) pairs, least recently used first."""
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+            }
@@ -0,0 +1,101 @@
+"""
+Self-cancelling journal entries (the Python side of src/utils/transactionFilter.ts).
+
+An entry booked to the generic suppliers account and reversed later in the
+same month shows up as two ledger lines that sum to zero. Both inflate the
+line counts and the gross totals, so their 'כותרת' entries are dropped at
+ingestion, before anything is aggregated.
+
+Lines are grouped as in getCancelledKoterot - (year, month, sort code,
+account key) - and paired with a sort instead of trying every combination:
+within a group, lines ordered by absolute amount (positive and negative
+lines of the same amount interleaved) put every cancelling pair next to each
+other, so one pass over adjacent lines finds them. O(n log n) overall.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ledger.vendors import UNMAPPED_VENDOR_ACCOUNT
+
+ENTRY_COLUMN = 'כותרת'
+
+# A pair cancels when its amounts sum to at most this much (shekels), as in transactionFilter.ts
+CANCEL_TOLERANCE = 0.5
+
+GROUP_COLUMNS = ('שנה', 'חודש', 'מספר קוד מיון', 'מפתח חשבון')
+
+
+def _group_codes(dataframe):
+    """Dense group number of every row over the GROUP_COLUMNS present (missing values form their own group)."""
+    codes = np.zeros(len(dataframe), dtype=np.int64)
+    for column in GROUP_COLUMNS:
+        if column not in dataframe.columns:
+            continue
+        column_codes, uniques = pd.factorize(dataframe[column], use_na_sentinel=False)
+        codes, _ = pd.factorize(codes * (len(uniques) + 1) + column_codes)
+    return codes
+
+
+def _run_offsets(starts):
+    """Position of every element within its run; ``starts`` flags the first element of each run."""
+    run_start = np.maximum.accumulate(np.where(starts, np.arange(len(starts)), 0))
+    return np.arange(len(starts)) - run_start
+
+
+def cancelling_entries(dataframe, tolerance=CANCEL_TOLERANCE):
+    """
+    Returns the sorted 'כותרת' numbers of the cancelling pairs in ``dataframe``.
+
+    A pair is two lines of the same group with opposite signs whose amounts
+    sum to within ``tolerance``, at least one of them against
+    UNMAPPED_VENDOR_ACCOUNT. Every line belongs to at most one pair. Frames
+    without 'כותרת' / 'ח-ן נגדי' columns have none.
+    """
+    if ENTRY_COLUMN not in dataframe.columns or 'ח-ן נגדי' not in dataframe.columns:
+        return np.empty(0, dtype=np.int64)
+
+    groups = _group_codes(dataframe)
+    amounts = dataframe['סכום'].to_numpy(dtype=np.float64)
+    unmapped = pd.array(dataframe['ח-ן נגדי'], dtype='Int64') == UNMAPPED_VENDOR_ACCOUNT
+    unmapped = unmapped.to_numpy(dtype=bool, na_value=False)
+
+    # Only groups with a suppliers-account line can hold a cancelling pair
+    candidate_groups = np.bincount(groups, weights=unmapped) > 0
+    rows = np.flatnonzero(candidate_groups[groups] & (amounts != 0))
+    if len(rows) < 2:
+        return np.empty(0, dtype=np.int64)
+    groups, amounts, unmapped = groups[rows], amounts[rows], unmapped[rows]
+    cents = np.rint(np.abs(amounts) * 100).astype(np.int64)
+    positive = amounts > 0
+
+    # Number the lines of each (group, amount, sign) run, then sort by that number
+    # before the sign: equal amounts alternate + - + -, so adjacent lines pair up
+    order = np.lexsort((positive, cents, groups))
+    keys = np.stack([groups[order], cents[order], positive[order]])
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = (keys[:, 1:] != keys[:, :-1]).any(axis=0)
+    occurrence = np.empty(len(order), dtype=np.int64)
+    occurrence[order] = _run_offsets(starts)
+    order = np.lexsort((positive, occurrence, cents, groups))
+
+    left, right = order[:-1], order[1:]
+    pairs = ((groups[left] == groups[right]) & (positive[left] != positive[right])
+             & (np.abs(amounts[left] + amounts[right]) <= tolerance) & (unmapped[left] | unmapped[right]))
+    # Overlapping candidates (a, b), (b, c): keep every other one of each run, so a line pairs once
+    pair_starts = pairs.copy()
+    pair_starts[1:] &= ~pairs[:-1]
+    taken = pairs & (_run_offsets(pair_starts) % 2 == 0)
+
+    lines = rows[np.concatenate([left[taken], right[taken]])]
+    entries = pd.array(dataframe[ENTRY_COLUMN], dtype='Int64')[lines]
+    return np.unique(entries.dropna().to_numpy(dtype=np.int64))
+
+
+def drop_cancelling_entries(dataframe, tolerance=CANCEL_TOLERANCE):
+    """Returns ``dataframe`` without the lines of its cancelling entries (see ``cancelling_entries``)."""
+    entries = cancelling_entries(dataframe, tolerance)
+    if len(entries) == 0:
+        return dataframe
+    keep = ~pd.array(dataframe[ENTRY_COLUMN], dtype='Int64').isin(entries).to_numpy(dtype=bool, na_value=False)
+    return dataframe[keep].reset_index(drop=True)
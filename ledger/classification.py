@@ -0,0 +1,67 @@
+"""
+Income/expense classification of report rows.
+
+The lookup is built once per loaded ledger and applied with ``Series.map``,
+instead of re-filtering the whole ledger for every pivot row.
+"""
+
+import pandas as pd
+
+INCOME = 'הכנסות'
+EXPENSE = 'הוצאות'
+
+
+def build_account_type_lookup(dataframe):
+    """
+    Returns a Series mapping every 'חשבון' to 'הכנסות' / 'הוצאות'.
+
+    An account counts as income if it appears on at least one income line,
+    which matches the previous per-row ``x in income_accounts`` check.
+    """
+    is_income = dataframe['קוד מיון'].eq(INCOME)
+    income_accounts = is_income.groupby(dataframe['חשבון'], observed=True).any()
+    return pd.Series(
+        income_accounts.map({True: INCOME, False: EXPENSE}).to_numpy(dtype=object),
+        index=income_accounts.index.astype(object),
+        name='סוג',
+    )
+
+
+def merge_account_types(account_types, other):
+    """
+    Combines two account lookups; an account is income if either marks it income.
+    """
+    combined = pd.concat([account_types, other])
+    is_income = combined.eq(INCOME).groupby(level=0).any()
+    return pd.Series(
+        is_income.map({True: INCOME, False: EXPENSE}).to_numpy(dtype=object),
+        index=is_income.index.astype(object),
+        name='סוג',
+    )
+
+
+def classify_rows(pivot_df, account_types, default=EXPENSE):
+    """
+    Returns the 'סוג' column for a reset-index pivot frame.
+
+    Rows grouped by 'קוד מיון' are classified by their category; rows grouped
+    by 'חשבון' only are looked up in ``account_types``. Frames with neither
+    column get ``default``.
+    """
+    if 'קוד מיון' in pivot_df.columns:
+        codes = pivot_df['קוד מיון'].astype(object)
+        return codes.eq(INCOME).map({True: INCOME, False: EXPENSE})
+    if 'חשבון' in pivot_df.columns:
+        return pivot_df['חשבון'].astype(object).map(account_types).fillna(EXPENSE)
+    return pd.Series(default, index=pivot_df.index, name='סוג')
+
+
+def negate_expenses(pivot_df, value_cols):
+    """Flips the sign of every expense row across ``value_cols`` in one assignment."""
+    value_cols = [col for col in value_cols if col in pivot_df.columns]
+    if not value_cols:
+        return pivot_df
+    is_expense = pivot_df['סוג'].eq(EXPENSE).to_numpy()
+    # + 0.0 turns the -0.0 of zero cells back into 0.0 (JSON, '< 0' style rules and Excel see the sign)
+    pivot_df.loc[is_expense, value_cols] = -pivot_df.loc[is_expense, value_cols] + 0.0
+    return pivot_df
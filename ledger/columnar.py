@@ -0,0 +1,171 @@
+"""
+Memory-mapped columnar storage for the ledger.
+
+Every column is written as a ``.npy`` file (categoricals as their integer
+codes, nullable integers as values + mask) with a small JSON manifest, and
+read back with ``np.load(mmap_mode='r')``. The resulting frame wraps the
+read-only mappings without copying, so all worker processes share one copy
+of the ledger through the OS page cache and their RSS does not grow with the
+number of ledger lines.
+
+Writers never modify a published directory: every write goes to a fresh
+directory of its own, which is then published in one rename. A replaced
+ledger (``write_columnar``) is a symlink to its current data directory, so
+readers see either the previous or the new column set, never a mix, and
+concurrent writers cannot delete each other's files.
+"""
+
+import errno
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+
+
+def _json_labels(values):
+    return [value if isinstance(value, (str, int, float)) else str(value) for value in values.tolist()]
+
+
+def _write_files(frame, tmp_dir):
+    columns = []
+    for position, name in enumerate(frame.columns):
+        series = frame[name]
+        entry = {'name': name, 'file': f'{position:03d}.npy'}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry['kind'] = 'categorical'
+            entry['categories'] = _json_labels(series.cat.categories)
+            entry['ordered'] = bool(series.cat.ordered)
+            data = series.array.codes
+        elif isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and hasattr(series.array, '_mask'):
+            entry['kind'] = 'masked'
+            entry['dtype'] = str(series.dtype)
+            entry['mask_file'] = f'{position:03d}.mask.npy'
+            data = series.array._data
+            np.save(os.path.join(tmp_dir, entry['mask_file']), series.array._mask)
+        elif pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+            entry['kind'] = 'numpy'
+            data = series.to_numpy()
+        else:
+            # Free text (e.g. פרטים) is stored dictionary-encoded as well
+            codes, uniques = pd.factorize(series)
+            entry['kind'] = 'categorical'
+            entry['categories'] = _json_labels(np.asarray(uniques, dtype=object))
+            entry['ordered'] = False
+            data = pd.Categorical.from_codes(codes, categories=range(len(uniques))).codes
+        np.save(os.path.join(tmp_dir, entry['file']), np.ascontiguousarray(data))
+        columns.append(entry)
+
+    with open(os.path.join(tmp_dir, MANIFEST), 'w', encoding='utf-8') as manifest:
+        json.dump({'format': FORMAT_VERSION, 'rows': len(frame), 'columns': columns}, manifest, ensure_ascii=False)
+
+
+def _new_dir(directory):
+    """A new, empty sibling directory of ``directory``, unique to this writer."""
+    directory = directory.rstrip(os.sep)
+    parent, name = os.path.split(directory)
+    os.makedirs(parent or '.', exist_ok=True)
+    new_dir = tempfile.mkdtemp(dir=parent or '.', prefix=f'.{name}.')
+    # mkdtemp creates it private (0700); published ledgers are readable like any other directory
+    os.chmod(new_dir, 0o755)
+    return new_dir
+
+
+def write_columnar(frame, directory):
+    """
+    Writes ``frame`` to ``directory`` (created; replaced atomically if it exists).
+
+    ``directory`` becomes a symlink to the data directory just written;
+    swapping the symlink is the only change readers can observe.
+    """
+    directory = directory.rstrip(os.sep)
+    data_dir = _new_dir(directory)
+    try:
+        _write_files(frame, data_dir)
+        link = data_dir + '.link'
+        os.symlink(os.path.basename(data_dir), link)
+    except BaseException:
+        shutil.rmtree(data_dir, ignore_errors=True)
+        raise
+    if os.path.islink(directory):
+        previous = os.path.realpath(directory)
+    elif os.path.isdir(directory):
+        # A plain directory (written before the symlink layout) is renamed aside first
+        previous = _new_dir(directory)
+        os.replace(directory, previous)
+    else:
+        previous = None
+    os.replace(link, directory)
+    if previous is not None:
+        # Frames opened from it keep their mappings; a reader still opening it retries
+        shutil.rmtree(previous, ignore_errors=True)
+    return directory
+
+
+def open_columnar(directory, attempts=3):
+    """Returns a frame backed by read-only memory maps of the files in ``directory``."""
+    for attempt in range(attempts):
+        # Resolved once, so all files come from the same data directory
+        data_dir = os.path.realpath(directory)
+        try:
+            return _open_files(data_dir)
+        except FileNotFoundError:
+            # Replaced while opening: the previous data directory was removed
+            if attempt == attempts - 1 or os.path.realpath(directory) == data_dir:
+                raise
+
+
+def _open_files(directory):
+    with open(os.path.join(directory, MANIFEST), encoding='utf-8') as manifest:
+        meta = json.load(manifest)
+
+    data = {}
+    for entry in meta['columns']:
+        values = np.load(os.path.join(directory, entry['file']), mmap_mode='r')
+        if entry['kind'] == 'categorical':
+            dtype = pd.CategoricalDtype(entry['categories'], ordered=entry['ordered'])
+            data[entry['name']] = pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+        elif entry['kind'] == 'masked':
+            mask = np.load(os.path.join(directory, entry['mask_file']), mmap_mode='r')
+            array_type = pd.api.types.pandas_dtype(entry['dtype']).construct_array_type()
+            data[entry['name']] = array_type(values, mask, copy=False)
+        else:
+            data[entry['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def store_ledger(frame, root, version, replaces=None):
+    """
+    Returns the columnar directory for ledger ``version`` under ``root``,
+    writing it first if this version has not been stored yet.
+
+    ``replaces`` is the version this one supersedes (e.g. the ledger before an
+    append): its directory is removed once ``version`` is stored. Frames
+    already mapped from it keep their pages; the files go when they are unmapped.
+    """
+    directory = os.path.join(root, version)
+    if not os.path.exists(os.path.join(directory, MANIFEST)):
+        _publish_version(frame, directory)
+    if replaces and replaces != version:
+        shutil.rmtree(os.path.join(root, replaces), ignore_errors=True)
+    return directory
+
+
+def _publish_version(frame, directory):
+    tmp_dir = _new_dir(directory)
+    try:
+        _write_files(frame, tmp_dir)
+        # A version is written once: if another process published it first, its copy is kept
+        os.rename(tmp_dir, directory)
+    except OSError as exc:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if exc.errno not in (errno.EEXIST, errno.ENOTEMPTY) or not os.path.exists(os.path.join(directory, MANIFEST)):
+            raise
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
@@ -0,0 +1,206 @@
+"""
+Base aggregation cube shared by the hierarchical and pivot reports.
+
+The ledger is reduced once, at load time, to a dense ``(pairs × months)``
+float64 matrix of 'סכום' totals, where each pair is a distinct
+('קוד מיון', 'חשבון') combination present in the data. Every report level
+('קוד מיון', 'חשבון' or both) is a roll-up of that matrix and never touches
+the raw transactions again. Appended journal entries are folded in by
+building a cube over the new rows only and merging it (``merge``).
+"""
+
+import numpy as np
+import pandas as pd
+
+from ledger.dtypes import to_month_categorical
+
+
+def _factorize_sorted(values):
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def _month_labels(years, names):
+    """Month column labels: the month name, plus the year when several years are present."""
+    if len(set(years)) == 1:
+        return list(names)
+    return [f'{name} {year}' for year, name in zip(years, names)]
+
+
+def _month_axis(dataframe, month_order):
+    """
+    Returns (row month codes, month names, axis) for the (year, month) columns present.
+    """
+    # Ordered categorical: codes already follow calendar order
+    month_values = to_month_categorical(dataframe['חודש'], month_order)
+    month_codes = month_values.cat.codes.to_numpy(dtype=np.int64)
+    categories = list(month_values.cat.categories)
+    calendar = {month: i + 1 for i, month in enumerate(month_order)}
+
+    if 'שנה' in dataframe.columns:
+        year_codes, years = pd.factorize(dataframe['שנה'], sort=True)
+        years = [int(year) for year in years]
+        if (year_codes < 0).any():
+            # Undated rows get their own year slot instead of a negative code
+            year_codes = np.where(year_codes < 0, len(years), year_codes)
+            years.append(None)
+    else:
+        year_codes, years = np.zeros(len(dataframe), dtype=np.int64), [None]
+
+    keys = year_codes.astype(np.int64) * len(categories) + month_codes
+    present, codes = np.unique(keys, return_inverse=True)
+
+    axis, names = [], []
+    for key in present:
+        year, category = years[key // len(categories)], categories[key % len(categories)]
+        axis.append((year, calendar.get(category)))
+        names.append(category)
+    return codes.reshape(-1), names, axis
+
+
+def _month_sort_key(entry):
+    """Calendar order of an (axis entry, month name) column: year, month, then non-calendar names."""
+    (year, month), name = entry
+    return (year is None, year or 0, month is None, month or 0, name)
+
+
+class AggregationCube:
+    """
+    Sums of 'סכום' at the finest (category, account, month) grain.
+
+    Attributes:
+        categories / accounts: sorted labels, indexed by code.
+        months: month column labels present in the ledger, in calendar order;
+            'ינואר 2025' style labels when the ledger spans several years.
+        month_names: the 'חודש' value behind every month column.
+        axis: (year, month number) of every month column - year is None when
+            the ledger has no 'שנה' column (see ledger.periods).
+        pair_category / pair_account: category and account code of every
+            matrix row; pairs are sorted by (category, account).
+        values: float64 matrix of shape (len(pairs), len(months)).
+    """
+
+    LEVEL_COLUMNS = ('קוד מיון', 'חשבון')
+
+    def __init__(self, categories, accounts, months, axis, pair_category, pair_account, values,
+                 month_names=None):
+        self.categories = categories
+        self.accounts = accounts
+        self.months = months
+        self.month_names = list(months) if month_names is None else month_names
+        self.axis = axis
+        self.pair_category = pair_category
+        self.pair_account = pair_account
+        self.values = values
+
+    @classmethod
+    def from_ledger(cls, dataframe, month_order):
+        """Builds the cube from a ledger with חודש / קוד מיון / חשבון / סכום columns."""
+        category_codes, categories = _factorize_sorted(dataframe['קוד מיון'])
+        account_codes, accounts = _factorize_sorted(dataframe['חשבון'])
+
+        month_codes, month_names, axis = _month_axis(dataframe, month_order)
+        months = _month_labels([year for year, _ in axis], month_names)
+
+        # One linear key per (category, account) pair; np.unique sorts it lexicographically
+        pair_keys = category_codes.astype(np.int64) * len(accounts) + account_codes
+        unique_pairs, pair_codes = np.unique(pair_keys, return_inverse=True)
+
+        values = np.zeros(len(unique_pairs) * len(months), dtype=np.float64)
+        np.add.at(values, pair_codes * len(months) + month_codes,
+                  dataframe['סכום'].to_numpy(dtype=np.float64))
+        values = values.reshape(len(unique_pairs), len(months))
+
+        return cls(
+            categories=categories,
+            accounts=accounts,
+            months=months,
+            axis=axis,
+            pair_category=unique_pairs // len(accounts),
+            pair_account=unique_pairs % len(accounts),
+            values=values,
+            month_names=month_names,
+        )
+
+    def merge(self, other):
+        """
+        Returns a cube holding the sums of this cube and ``other``.
+
+        Labels, month columns and pairs are unioned; the cost depends on the
+        number of pairs and months, not on how many ledger rows either cube
+        was built from.
+        """
+        categories = np.unique(np.concatenate([self.categories, other.categories]))
+        accounts = np.unique(np.concatenate([self.accounts, other.accounts]))
+
+        entries = sorted(set(zip(self.axis, self.month_names)) | set(zip(other.axis, other.month_names)),
+                         key=_month_sort_key)
+        axis = [entry[0] for entry in entries]
+        month_names = [entry[1] for entry in entries]
+        column_of = {entry: i for i, entry in enumerate(entries)}
+
+        def pair_keys(cube):
+            pair_category = np.searchsorted(categories, cube.categories[cube.pair_category])
+            pair_account = np.searchsorted(accounts, cube.accounts[cube.pair_account])
+            return pair_category.astype(np.int64) * len(accounts) + pair_account
+
+        self_keys, other_keys = pair_keys(self), pair_keys(other)
+        unique_pairs = np.union1d(self_keys, other_keys)
+
+        values = np.zeros((len(unique_pairs), len(entries)), dtype=np.float64)
+        for cube, keys in ((self, self_keys), (other, other_keys)):
+            rows = np.searchsorted(unique_pairs, keys)
+            columns = [column_of[entry] for entry in zip(cube.axis, cube.month_names)]
+            # Pairs and columns are unique within each cube, so a fancy-indexed += is exact
+            values[np.ix_(rows, columns)] += cube.values
+
+        return AggregationCube(
+            categories=categories,
+            accounts=accounts,
+            months=_month_labels([year for year, _ in axis], month_names),
+            axis=axis,
+            pair_category=unique_pairs // len(accounts),
+            pair_account=unique_pairs % len(accounts),
+            values=values,
+            month_names=month_names,
+        )
+
+    def rollup(self, levels, categories=None):
+        """
+        Returns a frame with the ``levels`` columns followed by one column per month.
+
+        Rows are sorted by the level labels, like ``DataFrame.pivot_table``.
+        ``categories`` restricts the ['קוד מיון', 'חשבון'] level to the pairs of
+        those categories (the children of tree nodes).
+        """
+        levels = list(levels)
+        if levels == ['קוד מיון', 'חשבון']:
+            pairs = slice(None)
+            if categories is not None:
+                wanted = np.isin(self.categories, np.asarray(list(categories), dtype=object))
+                pairs = wanted[self.pair_category]
+            frame = pd.DataFrame({
+                'קוד מיון': self.categories[self.pair_category[pairs]],
+                'חשבון': self.accounts[self.pair_account[pairs]],
+            })
+            matrix = self.values[pairs]
+        elif levels == ['קוד מיון']:
+            frame = pd.DataFrame({'קוד מיון': self.categories})
+            matrix = self._reduce(self.pair_category, len(self.categories))
+        elif levels == ['חשבון']:
+            frame = pd.DataFrame({'חשבון': self.accounts})
+            matrix = self._reduce(self.pair_account, len(self.accounts))
+        else:
+            raise ValueError(f'unsupported grouping levels: {levels}')
+
+        month_frame = pd.DataFrame(matrix, columns=self.months, index=frame.index)
+        return pd.concat([frame, month_frame], axis=1)
+
+    def category_totals(self):
+        """Returns the (categories x months) matrix of category totals."""
+        return self._reduce(self.pair_category, len(self.categories))
+
+    def _reduce(self, group_codes, n_groups):
+        out = np.zeros((n_groups, len(self.months)), dtype=np.float64)
+        np.add.at(out, group_codes, self.values)
+        return out
@@ -0,0 +1,148 @@
+"""
+Row index behind the report drill-down: aggregate cell -> ledger lines.
+
+Every ledger row belongs to one cell of the aggregation cube, a
+(('קוד מיון', 'חשבון') pair, month column) combination. The index keeps the
+row positions sorted by cell (``order``) and the start of every cell's run
+(``offsets``, one entry per cube cell plus the end). The rows behind any
+report cell - a single month, a quarter, a category total - are then a few
+slices of ``order``: O(cells + matches), without scanning the ledger.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ledger.cube import _month_axis
+
+
+def _label_codes(series, labels):
+    """Positions of ``series`` values in the sorted ``labels`` array (-1 for missing values)."""
+    codes, uniques = pd.factorize(series)
+    lookup = np.searchsorted(labels, np.asarray(uniques, dtype=object))
+    return np.append(lookup, -1)[codes]
+
+
+def _cube_pair_keys(cube):
+    return cube.pair_category.astype(np.int64) * len(cube.accounts) + cube.pair_account
+
+
+def _row_cells(dataframe, cube, month_order):
+    """Cube cell (pair code * months + month column) of every row, -1 if it has none."""
+    category_codes = _label_codes(dataframe['קוד מיון'], cube.categories)
+    account_codes = _label_codes(dataframe['חשבון'], cube.accounts)
+    pair_codes = np.searchsorted(_cube_pair_keys(cube), category_codes * len(cube.accounts) + account_codes)
+
+    month_codes, month_names, axis = _month_axis(dataframe, month_order)
+    columns = {entry: i for i, entry in enumerate(zip(cube.axis, cube.month_names))}
+    month_columns = np.array([columns[entry] for entry in zip(axis, month_names)], dtype=np.int64)
+
+    cells = pair_codes * len(cube.months) + month_columns[month_codes]
+    return np.where((category_codes < 0) | (account_codes < 0), -1, cells)
+
+
+def _gather(order, starts, stops):
+    """Concatenation of ``order[start:stop]`` for every (start, stop) pair, vectorized."""
+    lengths = stops - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=order.dtype)
+    run_starts = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    return order[run_starts + np.arange(total)]
+
+
+class DrillDownIndex:
+    """
+    Ledger row positions grouped by aggregation-cube cell.
+
+    Attributes:
+        cube: the AggregationCube whose cells are indexed.
+        order: row positions sorted by cell (stable: ledger order within a cell).
+        offsets: ``order[offsets[c]:offsets[c + 1]]`` are the rows of cell ``c``.
+    """
+
+    def __init__(self, cube, order, offsets):
+        self.cube = cube
+        self.order = order
+        self.offsets = offsets
+
+    @classmethod
+    def from_ledger(cls, dataframe, cube, month_order):
+        """Indexes ``dataframe``, the ledger ``cube`` was built from."""
+        cells = _row_cells(dataframe, cube, month_order)
+        valid = np.flatnonzero(cells >= 0)
+        order = valid[np.argsort(cells[valid], kind='stable')]
+        counts = np.bincount(cells[valid], minlength=len(cube.pair_category) * len(cube.months))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(cube, order, offsets)
+
+    def extend(self, new_rows, cube, first_row, month_order):
+        """
+        Returns the index after appending ``new_rows`` (ledger positions from
+        ``first_row`` on) and merging their aggregates into ``cube``.
+
+        The old rows keep their relative order and are moved block by block to
+        their cells' new offsets; only the new rows are sorted.
+        """
+        old = self.cube
+        n_cells = len(cube.pair_category) * len(cube.months)
+
+        # Old cell -> new cell: pairs and month columns only gain entries, so the map is monotonic
+        old_pairs = np.searchsorted(
+            _cube_pair_keys(cube),
+            np.searchsorted(cube.categories, old.categories[old.pair_category]) * len(cube.accounts)
+            + np.searchsorted(cube.accounts, old.accounts[old.pair_account]))
+        columns = {entry: i for i, entry in enumerate(zip(cube.axis, cube.month_names))}
+        old_columns = np.array([columns[entry] for entry in zip(old.axis, old.month_names)], dtype=np.int64)
+        cell_map = (old_pairs[:, None] * len(cube.months) + old_columns[None, :]).reshape(-1)
+
+        old_counts = np.zeros(n_cells, dtype=np.int64)
+        old_counts[cell_map] = np.diff(self.offsets)
+        new_cells = _row_cells(new_rows, cube, month_order)
+        valid = np.flatnonzero(new_cells >= 0)
+        new_cells = new_cells[valid]
+        new_counts = np.bincount(new_cells, minlength=n_cells)
+        offsets = np.concatenate([[0], np.cumsum(old_counts + new_counts)])
+
+        order = np.empty(len(self.order) + len(valid), dtype=np.int64)
+        # Old rows: same position within their cell's run, at the cell's new offset
+        old_cell_of = np.repeat(np.arange(len(cell_map)), np.diff(self.offsets))
+        within = np.arange(len(self.order)) - self.offsets[old_cell_of]
+        order[offsets[cell_map[old_cell_of]] + within] = self.order
+        # New rows: after the old rows of their cell, in ledger order
+        new_order = np.argsort(new_cells, kind='stable')
+        sorted_cells = new_cells[new_order]
+        run_start = np.searchsorted(sorted_cells, sorted_cells, side='left')
+        order[offsets[sorted_cells] + old_counts[sorted_cells] + np.arange(len(sorted_cells)) - run_start] = (
+            first_row + valid[new_order])
+        return DrillDownIndex(cube, order, offsets)
+
+    def _cells(self, categories, accounts, month_columns):
+        cube = self.cube
+        pairs = np.ones(len(cube.pair_category), dtype=bool)
+        if categories is not None:
+            pairs &= np.isin(cube.categories[cube.pair_category], np.asarray(list(categories), dtype=object))
+        if accounts is not None:
+            pairs &= np.isin(cube.accounts[cube.pair_account], np.asarray(list(accounts), dtype=object))
+        months = np.arange(len(cube.months)) if month_columns is None else np.asarray(month_columns, dtype=np.int64)
+        return (np.flatnonzero(pairs)[:, None] * len(cube.months) + months[None, :]).reshape(-1)
+
+    def rows(self, categories=None, accounts=None, month_columns=None):
+        """
+        Returns the ledger positions behind a report cell, in ledger order.
+
+        ``categories`` / ``accounts`` are label collections (None: all) and
+        ``month_columns`` indexes ``cube.months`` (None: all months).
+        """
+        cells = self._cells(categories, accounts, month_columns)
+        return np.sort(_gather(self.order, self.offsets[cells], self.offsets[cells + 1]))
+
+    def rows_by_month(self, categories=None, accounts=None):
+        """
+        Returns (ledger positions, month column of each) for the rows of
+        ``categories`` / ``accounts`` - enough to re-aggregate them along
+        another dimension without looking their months up again.
+        """
+        cells = self._cells(categories, accounts, None)
+        starts, stops = self.offsets[cells], self.offsets[cells + 1]
+        month_columns = np.repeat(cells % len(self.cube.months), stops - starts)
+        return _gather(self.order, starts, stops), month_columns
@@ -0,0 +1,68 @@
+"""
+Categorical encoding of the ledger's low-cardinality text columns.
+
+'חודש' becomes an ordered categorical in calendar order, so sorting and
+pivoting follow month_order without re-indexing; 'קוד מיון', 'חשבון', the
+counter-account name and the vendor become plain categoricals, which turns equality masks,
+``unique()`` and groupbys into integer-code operations.
+"""
+
+import pandas as pd
+
+MONTH_NAMES = ['ינואר', 'פברואר', 'מרץ', 'אפריל', 'מאי', 'יוני', 'יולי', 'אוגוסט', 'ספטמבר', 'אוקטובר', 'נובמבר', 'דצמבר']
+
+CATEGORICAL_COLUMNS = ('קוד מיון', 'חשבון', 'שם חשבון נגדי', 'ספק')
+
+
+def to_month_categorical(series, month_order=MONTH_NAMES):
+    """
+    Returns ``series`` as an ordered categorical following ``month_order``.
+
+    Values missing from ``month_order`` are kept, ordered after the known months.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype) and series.cat.ordered:
+        return series
+    present = set(series.dropna().unique())
+    extra = sorted(str(value) for value in present if value not in set(month_order))
+    categories = [month for month in month_order if month in present] + extra
+    return pd.Series(pd.Categorical(series, categories=categories, ordered=True),
+                     index=series.index, name=series.name)
+
+
+def categorize_ledger(dataframe, month_order=MONTH_NAMES):
+    """Returns ``dataframe`` with its text dimension columns converted to categoricals."""
+    converted = {}
+    if 'חודש' in dataframe.columns:
+        converted['חודש'] = to_month_categorical(dataframe['חודש'], month_order)
+    for column in CATEGORICAL_COLUMNS:
+        if column in dataframe.columns and not isinstance(dataframe[column].dtype, pd.CategoricalDtype):
+            converted[column] = dataframe[column].astype('category')
+    if not converted:
+        return dataframe
+    return dataframe.assign(**converted)
+
+
+def append_ledger_rows(dataframe, new_rows, month_order=MONTH_NAMES):
+    """
+    Returns ``dataframe`` (categorized) with ``new_rows`` appended.
+
+    Each categorical column is re-coded onto the union of both category sets
+    (integer code remapping - the existing text is not re-parsed), so the
+    result keeps the categorical dtypes of ``categorize_ledger``.
+    """
+    new_rows = categorize_ledger(new_rows.reindex(columns=dataframe.columns), month_order)
+    converted_old, converted_new = {}, {}
+    for column in dataframe.columns:
+        old, new = dataframe[column], new_rows[column]
+        if not isinstance(old.dtype, pd.CategoricalDtype):
+            continue
+        present = set(old.cat.categories) | set(new.dropna().unique())
+        if column == 'חודש':
+            categories = [month for month in month_order if month in present]
+            categories += sorted(str(value) for value in present if value not in set(month_order))
+        else:
+            categories = sorted(present)
+        dtype = pd.CategoricalDtype(categories, ordered=old.cat.ordered)
+        converted_old[column] = old.cat.set_categories(categories) if old.dtype != dtype else old
+        converted_new[column] = new.astype(dtype)
+    return pd.concat([dataframe.assign(**converted_old), new_rows.assign(**converted_new)], ignore_index=True)
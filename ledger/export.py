@@ -0,0 +1,101 @@
+"""
+Excel export of report frames and of the raw ledger.
+
+Workbooks are written with xlsxwriter in ``constant_memory`` mode: each row is
+flushed to disk as soon as the next one starts, so memory stays flat however
+many ledger lines are exported. Rows are read from the frame in chunks to
+avoid materializing the whole ledger as Python objects.
+"""
+
+import pandas as pd
+
+from ledger.classification import INCOME, EXPENSE
+from ledger.styles import TOTAL_ROW_MARKER
+
+NUMBER_FORMAT = '#,##0;[Red]-#,##0'
+DATE_FORMAT = 'dd/mm/yyyy'
+
+
+def _xlsxwriter():
+    try:
+        import xlsxwriter
+    except ImportError as exc:
+        raise RuntimeError('ייצוא לאקסל דורש את החבילה xlsxwriter (pip install xlsxwriter)') from exc
+    return xlsxwriter
+
+
+def _column_kind(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'date'
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return 'number'
+    return 'text'
+
+
+def _row_formats(workbook, colors):
+    """Returns {row type: {column kind: format}} for the report colouring."""
+    base = {'font_name': 'Arial', 'border': 1, 'border_color': colors['medium_gray'], 'reading_order': 2}
+    row_styles = {
+        None: {},
+        INCOME: {'bg_color': colors['income_color'], 'font_color': colors['text_income']},
+        EXPENSE: {'bg_color': colors['expense_color'], 'font_color': colors['text_expense']},
+        TOTAL_ROW_MARKER: {'bg_color': colors['primary_green'], 'font_color': 'white', 'bold': True},
+    }
+    kinds = {'text': {}, 'number': {'num_format': NUMBER_FORMAT}, 'date': {'num_format': DATE_FORMAT}}
+    return {
+        row_type: {kind: workbook.add_format({**base, **style, **extra}) for kind, extra in kinds.items()}
+        for row_type, style in row_styles.items()
+    }
+
+
+def write_frame_xlsx(path, frame, columns, colors, sheet_name='דוח', chunk_size=20_000):
+    """
+    Writes ``frame[columns]`` to an RTL worksheet at ``path``.
+
+    If ``frame`` has a 'סוג' column, rows are coloured by it (income, expense,
+    total row); it is not written as a column itself.
+    """
+    xlsxwriter = _xlsxwriter()
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        worksheet = workbook.add_worksheet(sheet_name[:31])
+        worksheet.right_to_left()
+        worksheet.freeze_panes(1, 0)
+
+        header_format = workbook.add_format({
+            'bold': True, 'font_color': 'white', 'bg_color': colors['primary_green'],
+            'border': 1, 'border_color': colors['medium_gray'], 'align': 'right', 'reading_order': 2,
+        })
+        formats = _row_formats(workbook, colors)
+        kinds = [_column_kind(frame[col]) for col in columns]
+
+        for col_idx, column in enumerate(columns):
+            worksheet.set_column(col_idx, col_idx, max(12, min(40, len(str(column)) + 4)))
+            worksheet.write_string(0, col_idx, str(column), header_format)
+
+        has_types = 'סוג' in frame.columns
+        for start in range(0, len(frame), chunk_size):
+            chunk = frame.iloc[start:start + chunk_size]
+            row_types = chunk['סוג'].to_numpy(dtype=object) if has_types else [None] * len(chunk)
+            values = chunk[columns].itertuples(index=False, name=None)
+            for offset, (row, row_type) in enumerate(zip(values, row_types)):
+                row_idx = start + offset + 1
+                row_formats = formats.get(row_type, formats[None])
+                for col_idx, (value, kind) in enumerate(zip(row, kinds)):
+                    cell_format = row_formats[kind]
+                    if value is None or pd.isna(value):
+                        worksheet.write_blank(row_idx, col_idx, None, cell_format)
+                    elif kind == 'number':
+                        worksheet.write_number(row_idx, col_idx, float(value), cell_format)
+                    elif kind == 'date':
+                        worksheet.write_datetime(row_idx, col_idx, value.to_pydatetime(), cell_format)
+                    else:
+                        worksheet.write_string(row_idx, col_idx, str(value), cell_format)
+    finally:
+        workbook.close()
+    return path
+
+
+def report_export_columns(frame):
+    """All report columns except the 'סוג' row-type marker."""
+    return [col for col in frame.columns if col != 'סוג']
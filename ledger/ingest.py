@@ -0,0 +1,154 @@
+"""
+Incremental ingestion of new journal-entry batches.
+
+A batch is an ERP export holding only the newly posted entries. Batch files
+dropped into an inbox directory are picked up by ``InboxWatcher``, reduced to
+the 'כותרת' (journal entry) numbers not ingested yet, and handed to a
+callback that folds them into the loaded ledger (see ``append_ledger`` in
+app.py) - the cost of a month-end update depends on the batch size, not on
+the size of the ledger.
+"""
+
+import fcntl
+import logging
+import os
+import threading
+
+from ledger.loader import normalize_erp_frame, read_erp_csv
+
+logger = logging.getLogger(__name__)
+
+BATCH_COLUMN = 'כותרת'
+
+
+class BatchRejected(ValueError):
+    """Raised by an ``on_batch`` callback for a batch that cannot be ingested as delivered."""
+
+
+def ingested_batches(dataframe):
+    """Returns the set of journal entry numbers ('כותרת') present in ``dataframe``."""
+    if BATCH_COLUMN not in dataframe.columns:
+        return set()
+    return set(dataframe[BATCH_COLUMN].dropna().unique().tolist())
+
+
+def new_entries(batch, seen):
+    """
+    Returns the rows of ``batch`` whose journal entry is not in ``seen``.
+
+    Re-exported batches, or files that overlap a previous one, therefore add
+    nothing twice. Ledgers without a 'כותרת' column are appended as-is.
+    """
+    if BATCH_COLUMN not in batch.columns or not seen:
+        return batch
+    return batch[~batch[BATCH_COLUMN].isin(seen).to_numpy(dtype=bool)]
+
+
+def read_batch(path):
+    """
+    Reads one ERP batch export into the ledger schema.
+
+    Cancelling entries are dropped within the batch; a reversal of an entry
+    from an earlier batch is appended like any other entry.
+    """
+    return normalize_erp_frame(read_erp_csv(path))
+
+
+class InboxWatcher:
+    """
+    Polls ``directory`` for new ``*.csv`` batch files and calls ``on_batch(frame, path)``.
+
+    A file is ingested once its size and mtime were unchanged between two
+    polls, so a batch that is still being written is not read half-way.
+    Files are processed in (mtime, name) order; each is ingested at most once
+    per process.
+
+    With ``subdirectories``, batch files are also read from the immediate
+    subdirectories of ``directory`` (e.g. one per company), and ``on_batch``
+    tells them apart by ``path``. A batch it rejects (``BatchRejected``) is
+    logged and skipped until the file changes.
+
+    With ``lock_path``, watchers of several processes elect one ingester: only
+    the watcher holding an exclusive lock on that file polls, and another one
+    takes over when its process exits.
+    """
+
+    def __init__(self, directory, on_batch, interval=5.0, lock_path=None, subdirectories=False):
+        self.directory = directory
+        self.on_batch = on_batch
+        self.interval = interval
+        self.lock_path = lock_path
+        self.subdirectories = subdirectories
+        self._lock_file = None
+        self._processed = set()
+        self._last_seen = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='ledger-inbox', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if self.holds_lock():
+                    self.poll()
+            except Exception:
+                logger.exception('ledger inbox poll failed')
+
+    def holds_lock(self):
+        """Whether this watcher is the ingester (always, without ``lock_path``)."""
+        if self.lock_path is None or self._lock_file is not None:
+            return True
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info('ingesting %s in process %d', self.directory, os.getpid())
+        return True
+
+    def poll(self):
+        """Ingests every settled, unprocessed batch file; returns the paths ingested."""
+        if not os.path.isdir(self.directory):
+            return []
+        candidates = []
+        for entry in self._batch_files():
+            stat = entry.stat()
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if (entry.path, signature) in self._processed:
+                continue
+            previous = self._last_seen.get(entry.path)
+            self._last_seen[entry.path] = signature
+            if previous == signature:
+                candidates.append((stat.st_mtime_ns, entry.name, entry.path, signature))
+
+        ingested = []
+        for _, _, path, signature in sorted(candidates):
+            try:
+                self.on_batch(read_batch(path), path)
+            except BatchRejected as exc:
+                logger.error('ledger batch %s rejected: %s', path, exc)
+            else:
+                ingested.append(path)
+            self._processed.add((path, signature))
+        return ingested
+
+    def _batch_files(self):
+        directories = [self.directory]
+        if self.subdirectories:
+            directories += sorted(entry.path for entry in os.scandir(self.directory)
+                                  if entry.is_dir() and not entry.name.startswith('.'))
+        for directory in directories:
+            for entry in os.scandir(directory):
+                if entry.is_file() and entry.name.lower().endswith('.csv'):
+                    yield entry
+
@@ -0,0 +1,112 @@
+"""
+Opening / closing inventory snapshots and the COGS adjustment they imply.
+
+The snapshot file is the React app's inventory backup
+(``{"opening": {"1": ...}, "closing": {...}, "lastSaved": ...}``, months
+1-12 of one year). Cost of goods sold for a month is the booked COGS plus
+(opening - closing) inventory, as in MonthlyReport.tsx. ``adjustment(axis)``
+aligns that difference with a cube's month columns in one array operation,
+and every snapshot carries a content ``version`` so cached P&L statements
+can be keyed by it - and patched month by month when a single value changes.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+MONTHS_PER_YEAR = 12
+
+
+def _month_values(mapping):
+    values = np.full(MONTHS_PER_YEAR, np.nan)
+    for month, value in (mapping or {}).items():
+        month = int(month)
+        if 1 <= month <= MONTHS_PER_YEAR and value is not None and value != '':
+            values[month - 1] = float(value)
+    return values
+
+
+def _month_mapping(values):
+    return {str(month): (int(value) if float(value).is_integer() else float(value))
+            for month, value in enumerate(values, start=1) if not np.isnan(value)}
+
+
+class Inventory:
+    """
+    Opening and closing inventory per month (NaN: not entered) of ``year``.
+
+    Instances are immutable: ``with_month`` returns an edited copy with a new ``version``.
+    A None ``year`` applies the values to every year of the ledger.
+    """
+
+    def __init__(self, opening=None, closing=None, year=None, saved_at=None):
+        self.opening = _month_values(opening)
+        self.closing = _month_values(closing)
+        self.year = year
+        self.saved_at = saved_at
+        payload = json.dumps([_month_mapping(self.opening), _month_mapping(self.closing), year], sort_keys=True)
+        self.version = hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+    @classmethod
+    def from_json(cls, payload, year=None):
+        return cls(payload.get('opening'), payload.get('closing'), year, payload.get('lastSaved'))
+
+    def to_json(self):
+        return {'opening': _month_mapping(self.opening), 'closing': _month_mapping(self.closing),
+                'lastSaved': self.saved_at}
+
+    def monthly_adjustment(self):
+        """(opening - closing) for months 1-12; months not entered count as 0, as in MonthlyReport.tsx."""
+        return np.nan_to_num(self.opening) - np.nan_to_num(self.closing)
+
+    def adjustment(self, axis):
+        """
+        COGS adjustment for every (year, month number) entry of a cube ``axis``;
+        0 for other years and for columns without a calendar month.
+        """
+        years = np.array([year if year is not None else -1 for year, _ in axis], dtype=np.int64)
+        months = np.array([month or 0 for _, month in axis], dtype=np.int64)
+        applies = (months >= 1) & (months <= MONTHS_PER_YEAR)
+        if self.year is not None:
+            applies &= (years == self.year) | (years == -1)
+        return np.where(applies, self.monthly_adjustment()[np.clip(months - 1, 0, MONTHS_PER_YEAR - 1)], 0.0)
+
+    def with_month(self, month, opening=None, closing=None):
+        """
+        Returns a copy with ``month``'s opening and/or closing value replaced.
+        A closing value is also the next month's opening value.
+        """
+        opening_values, closing_values = self.opening.copy(), self.closing.copy()
+        if opening is not None:
+            opening_values[month - 1] = opening
+        if closing is not None:
+            closing_values[month - 1] = closing
+            if month < MONTHS_PER_YEAR:
+                opening_values[month] = closing
+        return Inventory(_month_mapping(opening_values), _month_mapping(closing_values), self.year, self.saved_at)
+
+    def changed_months(self, other):
+        """Month numbers whose COGS adjustment differs between ``self`` and ``other``."""
+        return np.flatnonzero(self.monthly_adjustment() != other.monthly_adjustment()) + 1
+
+
+def load_inventory(path, year=None):
+    """Reads an inventory backup file; a missing file is an empty inventory."""
+    if not os.path.exists(path):
+        return Inventory(year=year)
+    with open(path, encoding='utf-8') as inventory_file:
+        return Inventory.from_json(json.load(inventory_file), year)
+
+
+def save_inventory(inventory, path):
+    """Writes ``inventory`` in the backup format (atomically) and returns it with its save time."""
+    saved = Inventory(_month_mapping(inventory.opening), _month_mapping(inventory.closing), inventory.year,
+                      datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        json.dump(saved.to_json(), out, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return saved
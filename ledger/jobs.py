@@ -0,0 +1,201 @@
+"""
+Background report jobs: a local process pool with a disk-backed result store.
+
+Long report builds run in forked worker processes instead of on the request
+thread, so one large pivot does not hold up the other users of a web worker.
+The children inherit the loaded ledger (copy-on-write, or the shared memory
+maps of ledger.columnar) when the pool starts; ``restart()`` replaces the
+pool after the ledger changes.
+
+A job function is called as ``func(progress, *args)``. ``progress(fraction,
+message)`` records how far it got and raises ``JobCancelled`` once the job
+was cancelled, so superseded jobs stop at their next stage boundary. Status
+and result files live in ``directory``, so any process sharing it (e.g. every
+gunicorn worker) can poll a job from a dcc.Interval callback, read its pickled
+result once it is done, or cancel it.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_CANCELLED = 'pending', 'running', 'done', 'failed', 'cancelled'
+
+# Files of jobs nobody collected (closed browser tab, superseded job) are removed after this many seconds
+STALE_AFTER = 3600
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by ``progress()`` after the job was cancelled."""
+
+
+def _write_json(path, payload):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        json.dump(payload, out, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class ResultStore:
+    """Job status (JSON) and result (pickle) files under ``directory``."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.directory, f'{job_id}.{suffix}')
+
+    def set_status(self, job_id, state, fraction=0.0, message=''):
+        _write_json(self._path(job_id, 'status'), {'state': state, 'progress': fraction, 'message': message})
+
+    def status(self, job_id):
+        try:
+            with open(self._path(job_id, 'status'), encoding='utf-8') as status_file:
+                return json.load(status_file)
+        except FileNotFoundError:
+            return None
+
+    def put_result(self, job_id, value):
+        tmp_path = self._path(job_id, 'pickle.tmp')
+        with open(tmp_path, 'wb') as out:
+            pickle.dump(value, out, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(job_id, 'pickle'))
+
+    def result(self, job_id):
+        with open(self._path(job_id, 'pickle'), 'rb') as result_file:
+            return pickle.load(result_file)
+
+    def request_cancel(self, job_id):
+        open(self._path(job_id, 'cancel'), 'w').close()
+
+    def cancel_requested(self, job_id):
+        return os.path.exists(self._path(job_id, 'cancel'))
+
+    def prune(self, max_age=STALE_AFTER):
+        """Removes the files of jobs untouched for ``max_age`` seconds."""
+        cutoff = time.time() - max_age
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def remove(self, job_id):
+        for suffix in ('status', 'pickle', 'pickle.tmp', 'cancel'):
+            try:
+                os.remove(self._path(job_id, suffix))
+            except FileNotFoundError:
+                pass
+
+
+def _run_job(directory, job_id, func, args):
+    """Body of every job in the pool processes."""
+    store = ResultStore(directory)
+
+    def progress(fraction, message=''):
+        if store.cancel_requested(job_id):
+            raise JobCancelled(job_id)
+        store.set_status(job_id, JOB_RUNNING, fraction, message)
+
+    try:
+        progress(0.0)
+        value = func(progress, *args)
+        if store.cancel_requested(job_id):
+            raise JobCancelled(job_id)
+        store.put_result(job_id, value)
+        store.set_status(job_id, JOB_DONE, 1.0)
+    except JobCancelled:
+        store.set_status(job_id, JOB_CANCELLED)
+    except Exception as exc:
+        logger.exception('report job %s failed', job_id)
+        store.set_status(job_id, JOB_FAILED, message=str(exc))
+
+
+class JobQueue:
+    """
+    Runs report jobs on a lazily started pool of ``max_workers`` forked processes.
+
+    ``initializer`` runs once in every new pool process, e.g. to replace state
+    whose locks may have been held by another thread at fork time.
+    """
+
+    def __init__(self, directory, max_workers=2, initializer=None):
+        self.store = ResultStore(directory)
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self._pool = None
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            # fork: the children start with this process's ledger and aggregates
+            self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('fork'),
+                                             initializer=self.initializer)
+        return self._pool
+
+    def submit(self, func, *args):
+        """Queues ``func(progress, *args)`` and returns the job id."""
+        self.store.prune()
+        job_id = uuid.uuid4().hex
+        self.store.set_status(job_id, JOB_PENDING)
+        with self._lock:
+            self._futures[job_id] = self._executor().submit(_run_job, self.store.directory, job_id, func, args)
+        return job_id
+
+    def status(self, job_id):
+        """
+        Returns {'state', 'progress', 'message'} for ``job_id``; a job whose
+        process died is reported as failed.
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+        finished = future is not None and future.done()
+        # Read after future.done(): a finished job has already written its final state
+        status = self.store.status(job_id) or {'state': JOB_FAILED, 'progress': 0.0, 'message': 'unknown job'}
+        if finished and status['state'] in (JOB_PENDING, JOB_RUNNING):
+            if future.cancelled():
+                status = {**status, 'state': JOB_CANCELLED}
+            else:
+                status = {**status, 'state': JOB_FAILED, 'message': str(future.exception() or 'job process exited')}
+        return status
+
+    def result(self, job_id):
+        """Returns the result of a finished job and removes its files."""
+        try:
+            return self.store.result(job_id)
+        finally:
+            self.discard(job_id)
+
+    def cancel(self, job_id):
+        """Cancels ``job_id``: dropped if still queued, stopped at its next progress() call if running."""
+        self.store.request_cancel(job_id)
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            self.discard(job_id)
+
+    def discard(self, job_id):
+        with self._lock:
+            self._futures.pop(job_id, None)
+        self.store.remove(job_id)
+
+    def restart(self):
+        """Cancels every job and drops the pool, so the next job forks from the current state."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+            job_ids = list(self._futures)
+        for job_id in job_ids:
+            self.store.request_cancel(job_id)
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
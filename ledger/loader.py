@@ -0,0 +1,162 @@
+"""
+Loader for the ERP transactions CSV export (the file src/utils/parsers.ts reads).
+
+Parses the export with explicit dtypes into the ledger schema used by app.py
+('חודש', 'קוד מיון', 'חשבון', 'סכום', plus the source columns later stages
+need), and keeps a Parquet copy next to it so restarts skip the CSV parse.
+The Parquet cache needs pyarrow; without it the CSV is parsed on every load.
+"""
+
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from ledger.cancelling import drop_cancelling_entries
+from ledger.dtypes import MONTH_NAMES, categorize_ledger
+from ledger.vendors import VENDOR_COLUMN, resolve_vendors
+
+logger = logging.getLogger(__name__)
+
+# Bump when the parsed schema changes so stale Parquet caches are ignored
+LOADER_VERSION = 4
+
+# 'קוד מיון' values booked as revenue (same map as src/components/RawData.tsx)
+INCOME_SORT_CODES = (600, 700)
+
+# Lower sort codes are balance-sheet accounts (customers, suppliers, banks) - not part of the P&L
+PNL_SORT_CODE_MIN = 600
+
+# Source columns read from the export. All are read as text ('1,234.50' amounts,
+# DD/MM/YYYY dates) and converted explicitly in normalize_erp_frame.
+ERP_COLUMNS = [
+    'כותרת', 'תנועה', 'ח-ן נגדי', 'שם חשבון נגדי', 'ת.אסמכ', 'ת.ערך', 'תאריך 3',
+    'פרטים', 'חובה / זכות (שקל)', 'מפתח חשבון', 'שם חשבון', 'קוד מיון', 'שם קוד מיון',
+]
+
+LEDGER_COLUMNS = [
+    'חודש', 'קוד מיון', 'חשבון', 'סכום',
+    'תאריך', 'שנה', 'כותרת', 'תנועה', 'מפתח חשבון', 'מספר קוד מיון',
+    'פרטים', 'ח-ן נגדי', 'שם חשבון נגדי', VENDOR_COLUMN,
+]
+
+
+def parse_amounts(series):
+    """Converts '1,234.50' style text to float64; blanks and garbage become 0."""
+    cleaned = series.astype('string').str.replace(',', '', regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors='coerce').fillna(0.0).astype(np.float64)
+
+
+def parse_dates(series):
+    """Parses DD/MM/YYYY text to datetime64; unparsable values become NaT."""
+    return pd.to_datetime(series.astype('string').str.strip(), format='%d/%m/%Y', errors='coerce')
+
+
+def _integers(series):
+    return pd.to_numeric(series.astype('string').str.replace(',', '', regex=False).str.strip(),
+                         errors='coerce').astype('Int64')
+
+
+def read_erp_csv(path):
+    """Reads the raw export, keeping only the columns the dashboard uses."""
+    header = pd.read_csv(path, nrows=0, encoding='utf-8-sig').columns
+    usecols = [col for col in ERP_COLUMNS if col in header]
+    return pd.read_csv(path, usecols=usecols, dtype={col: 'string' for col in usecols},
+                       keep_default_na=False, encoding='utf-8-sig')
+
+
+def normalize_erp_frame(raw):
+    """
+    Converts a raw export frame (all text) to the ledger schema.
+
+    'סכום' holds the amount in the direction the reports expect: revenue as
+    booked, expenses sign-flipped, so negate_expenses() restores the ERP sign.
+    Rows without an account, sort code or date are dropped, as in parsers.ts,
+    and so are balance-sheet rows (sort code below PNL_SORT_CODE_MIN) and
+    self-cancelling entries. The 'ספק' column is resolved here, once per
+    ingested file.
+    """
+    raw = raw.reindex(columns=ERP_COLUMNS, fill_value='')
+
+    dates = parse_dates(raw['ת.ערך'])
+    for fallback in ('תאריך 3', 'ת.אסמכ'):
+        dates = dates.fillna(parse_dates(raw[fallback]))
+
+    sort_codes = _integers(raw['קוד מיון'])
+    account_keys = _integers(raw['מפתח חשבון'])
+    amounts = parse_amounts(raw['חובה / זכות (שקל)'])
+
+    is_income = sort_codes.isin(INCOME_SORT_CODES).fillna(False).to_numpy(dtype=bool)
+    category_names = raw['שם קוד מיון'].astype('string').str.strip()
+    category_names = category_names.mask(category_names.eq(''), 'קוד ' + sort_codes.astype('string'))
+    account_names = raw['שם חשבון'].astype('string').str.strip()
+    account_names = account_names.mask(account_names.eq(''), account_keys.astype('string'))
+
+    month_numbers = dates.dt.month.fillna(0).astype(int).to_numpy()
+    months = np.array([''] + MONTH_NAMES, dtype=object)[month_numbers]
+
+    ledger = pd.DataFrame({
+        'חודש': months,
+        'קוד מיון': np.where(is_income, 'הכנסות', category_names.to_numpy(dtype=object, na_value='')),
+        'חשבון': account_names.to_numpy(dtype=object, na_value=''),
+        'סכום': np.where(is_income, amounts, -amounts),
+        'תאריך': dates,
+        'שנה': dates.dt.year.astype('Int16'),
+        'כותרת': _integers(raw['כותרת']),
+        'תנועה': _integers(raw['תנועה']),
+        'מפתח חשבון': account_keys,
+        'מספר קוד מיון': sort_codes.astype('Int16'),
+        'פרטים': raw['פרטים'].astype('string').str.strip().fillna('').to_numpy(dtype=object),
+        'ח-ן נגדי': _integers(raw['ח-ן נגדי']),
+        'שם חשבון נגדי': raw['שם חשבון נגדי'].astype('string').str.strip().fillna('').to_numpy(dtype=object),
+    })
+
+    valid = dates.notna() & account_keys.notna() & sort_codes.ge(PNL_SORT_CODE_MIN).fillna(False)
+    ledger = ledger[valid.to_numpy(dtype=bool)].reset_index(drop=True)
+    # Entries reversed within the same month never reach the aggregates (see ledger.cancelling)
+    ledger = drop_cancelling_entries(ledger)
+    # 'ספק': the counter account, or the vendor named in 'פרטים' (see ledger.vendors)
+    ledger[VENDOR_COLUMN] = resolve_vendors(ledger)
+    return categorize_ledger(ledger[LEDGER_COLUMNS])
+
+
+def parquet_cache_path(csv_path, cache_dir=None):
+    """Returns the cache file for ``csv_path``, keyed by its size and mtime."""
+    stat = os.stat(csv_path)
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(csv_path)), '.ledger_cache')
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f'{stem}-v{LOADER_VERSION}-{stat.st_size}-{stat.st_mtime_ns}.parquet')
+
+
+def _parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def load_ledger(csv_path, cache_dir=None, use_cache=True):
+    """
+    Loads the ERP export at ``csv_path`` as a ledger frame.
+
+    A Parquet cache keyed by the CSV's size and mtime is read when present and
+    written after a fresh parse.
+    """
+    if use_cache and not _parquet_available():
+        logger.info('pyarrow is not installed - ledger Parquet cache disabled')
+        use_cache = False
+    cache_path = parquet_cache_path(csv_path, cache_dir) if use_cache else None
+
+    if cache_path and os.path.exists(cache_path):
+        return pd.read_parquet(cache_path)
+
+    ledger = normalize_erp_frame(read_erp_csv(csv_path))
+
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + '.tmp'
+        ledger.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+    return ledger
@@ -0,0 +1,184 @@
+"""
+Callback instrumentation: per-stage timings, payload sizes and on-demand profiles.
+
+``MetricsRegistry.instrument(name)`` wraps a Dash callback; inside it,
+``stage('...')`` blocks time the parts of the work (aggregation,
+classification, styles, ``to_dict``...). The web layer reports what happens
+after the callback returns (JSON serialization and response size) through
+``observe_response``. ``render()`` emits everything in the Prometheus text
+exposition format for a ``/metrics`` endpoint.
+
+Counters are per process: behind gunicorn every worker reports its own
+totals, labelled with its pid.
+"""
+
+import contextlib
+import contextvars
+import cProfile
+import functools
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds / bytes) of the histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PAYLOAD_BUCKETS = (1_000, 10_000, 100_000, 500_000, 1_000_000, 5_000_000, 10_000_000, 50_000_000)
+
+_current = contextvars.ContextVar('callback_trace', default=None)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+def _labels(**labels):
+    parts = []
+    for key, value in labels.items():
+        text = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{text}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Times the enclosed block as stage ``name`` of the running callback.
+
+    A no-op outside an instrumented callback (e.g. in warm-up or prefetch threads).
+    """
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.append((name, time.perf_counter() - start))
+
+
+class MetricsRegistry:
+    """Thread-safe store of callback durations, stage timings and payload sizes."""
+
+    def __init__(self, prefix='dash'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._stages = {}
+        self._payloads = {}
+        self._errors = {}
+
+    def observe_callback(self, callback, seconds, stages=(), error=False):
+        with self._lock:
+            self._durations.setdefault(callback, _Histogram(DURATION_BUCKETS)).observe(seconds)
+            for name, stage_seconds in stages:
+                self._stages.setdefault((callback, name), _Histogram(DURATION_BUCKETS)).observe(stage_seconds)
+            if error:
+                self._errors[callback] = self._errors.get(callback, 0) + 1
+
+    def observe_response(self, callback, serialize_seconds, payload_bytes):
+        """Records the work Dash does after ``callback`` returned: JSON encoding and the response size."""
+        with self._lock:
+            self._stages.setdefault((callback, 'serialize'), _Histogram(DURATION_BUCKETS)).observe(serialize_seconds)
+            self._payloads.setdefault(callback, _Histogram(PAYLOAD_BUCKETS)).observe(payload_bytes)
+
+    def instrument(self, callback, profile=None, on_exit=None):
+        """
+        Decorator recording the wrapped function's duration and ``stage()`` timings
+        under ``callback``.
+
+        ``profile`` is called before every invocation and returns a directory to
+        write a cProfile dump of this call to, or None to skip profiling.
+        ``on_exit(callback)`` is called when the wrapped function has returned.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                trace = []
+                token = _current.set(trace)
+                profile_dir = profile() if profile else None
+                profiler = cProfile.Profile() if profile_dir else None
+                start = time.perf_counter()
+                error = False
+                try:
+                    if profiler:
+                        profiler.enable()
+                    return func(*args, **kwargs)
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    elapsed = time.perf_counter() - start
+                    if profiler:
+                        profiler.disable()
+                        file_name = f'{callback}-{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}.prof'
+                        path = os.path.join(profile_dir, file_name)
+                        profiler.dump_stats(path)
+                        logger.info('profile of %s written to %s', callback, path)
+                    _current.reset(token)
+                    self.observe_callback(callback, elapsed, trace, error)
+                    if on_exit:
+                        on_exit(callback)
+            return wrapper
+        return decorator
+
+    def render(self, gauges=()):
+        """
+        Returns the metrics in the Prometheus text format.
+
+        ``gauges`` adds (name, help, [(labels dict, value), ...]) families
+        computed at scrape time.
+        """
+        pid = os.getpid()
+        lines = []
+
+        def histogram(name, help_text, series):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, hist in series:
+                for bound, count in zip(hist.buckets, hist.counts):
+                    lines.append(f'{name}_bucket{_labels(**labels, le=_number(bound), pid=pid)} {count}')
+                lines.append(f'{name}_bucket{_labels(**labels, le="+Inf", pid=pid)} {hist.count}')
+                lines.append(f'{name}_sum{_labels(**labels, pid=pid)} {_number(hist.sum)}')
+                lines.append(f'{name}_count{_labels(**labels, pid=pid)} {hist.count}')
+
+        with self._lock:
+            histogram(f'{self.prefix}_callback_duration_seconds', 'Time spent inside a Dash callback.',
+                      [({'callback': name}, hist) for name, hist in sorted(self._durations.items())])
+            histogram(f'{self.prefix}_callback_stage_seconds', 'Time spent in one stage of a Dash callback.',
+                      [({'callback': name, 'stage': stage_name}, hist)
+                       for (name, stage_name), hist in sorted(self._stages.items())])
+            histogram(f'{self.prefix}_callback_payload_bytes', 'Size of the JSON response of a Dash callback.',
+                      [({'callback': name}, hist) for name, hist in sorted(self._payloads.items())])
+
+            name = f'{self.prefix}_callback_errors_total'
+            lines.append(f'# HELP {name} Dash callback invocations that raised.')
+            lines.append(f'# TYPE {name} counter')
+            for callback, count in sorted(self._errors.items()):
+                lines.append(f'{name}{_labels(callback=callback, pid=pid)} {count}')
+
+        for name, help_text, samples in gauges:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in samples:
+                lines.append(f'{name}{_labels(**labels, pid=pid)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
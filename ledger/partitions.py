@@ -0,0 +1,167 @@
+"""
+Ledgers of several companies, partitioned by company and year on disk.
+
+A partition is one company's ledger lines of one year, stored as a columnar
+directory (ledger.columnar) under ``<root>/<company>/<year>/ledger`` - next to
+it, ``inventory.json`` holds that year's inventory snapshot. Opening a
+partition only maps its files; the aggregation cube, search index and
+drill-down index are what take memory, and they are built per partition by
+``LoadedLedger.from_frame`` when the partition is first selected. The app
+keeps a bounded LRU of loaded partitions, so memory follows the partitions in
+use rather than the number of companies hosted. ledger.store_partitions
+imports an ERP export as partitions.
+"""
+
+import os
+
+import pandas as pd
+
+from ledger.cache import appended_version, dataset_version
+from ledger.classification import build_account_type_lookup, merge_account_types
+from ledger.columnar import MANIFEST, open_columnar, store_ledger, write_columnar
+from ledger.cube import AggregationCube
+from ledger.drilldown import DrillDownIndex
+from ledger.dtypes import MONTH_NAMES, append_ledger_rows, categorize_ledger
+from ledger.ingest import ingested_batches, new_entries
+from ledger.pnl import build_category_codes, category_sections, merge_category_codes
+from ledger.search import LedgerSearchIndex
+
+LEDGER_DIR = 'ledger'
+INVENTORY_FILE = 'inventory.json'
+
+
+class LoadedLedger:
+    """
+    A ledger frame and everything the reports derive from it. Immutable:
+    ``append`` returns a new instance, so requests holding the previous one
+    keep a consistent view until they finish.
+    """
+
+    def __init__(self, frame, version, cube, search_index, drilldown_index, account_types, category_codes,
+                 batches):
+        self.frame = frame
+        self.version = version
+        self.cube = cube
+        self.search_index = search_index
+        self.drilldown_index = drilldown_index
+        self.account_types = account_types
+        self.category_codes = category_codes
+        self.category_sections = category_sections(category_codes)
+        self.batches = batches
+
+    @classmethod
+    def from_frame(cls, dataframe, month_order=MONTH_NAMES, mmap_dir=None):
+        """
+        Builds the derived structures of ``dataframe``; with ``mmap_dir`` the
+        frame is served from read-only memory maps stored there.
+        """
+        # חודש as an ordered categorical (month_order), קוד מיון / חשבון as categoricals
+        frame = categorize_ledger(dataframe, month_order)
+        version = dataset_version(frame)
+        if mmap_dir:
+            frame = open_columnar(store_ledger(frame, mmap_dir, version))
+        # (קוד מיון, חשבון) x חודש sums - every report level is a roll-up of this cube
+        cube = AggregationCube.from_ledger(frame, month_order)
+        return cls(
+            frame, version, cube,
+            # n-gram index over חשבון / קוד מיון / פרטים for the search bar
+            LedgerSearchIndex(frame),
+            # Ledger rows grouped by cube cell, for the report drill-down
+            DrillDownIndex.from_ledger(frame, cube, month_order),
+            # חשבון -> הכנסות/הוצאות, built once per loaded ledger instead of per pivot row
+            build_account_type_lookup(frame),
+            # קוד מיון -> lowest sort code, which picks its P&L section (revenue / COGS / operating / financial)
+            build_category_codes(frame),
+            # כותרת numbers already loaded, so re-delivered batches are not appended twice
+            ingested_batches(frame),
+        )
+
+    def append(self, new_rows, month_order=MONTH_NAMES, mmap_dir=None):
+        """
+        Returns (ledger with ``new_rows`` appended, the rows actually appended).
+
+        Entries already loaded are skipped; when nothing is new, ``self`` is
+        returned. Only the new rows are aggregated: their cube is merged into
+        the existing one and the indexes and version hash are extended.
+        """
+        new_rows = new_entries(new_rows, self.batches)
+        if new_rows.empty:
+            return self, new_rows
+        n_rows = len(self.frame)
+        combined = append_ledger_rows(self.frame, new_rows, month_order)
+        new_rows = combined.iloc[n_rows:]
+        version = appended_version(self.version, n_rows, new_rows)
+        if mmap_dir:
+            combined = open_columnar(store_ledger(combined, mmap_dir, version, replaces=self.version))
+        cube = self.cube.merge(AggregationCube.from_ledger(new_rows, month_order))
+        ledger = LoadedLedger(
+            combined, version, cube,
+            self.search_index.extend(new_rows),
+            self.drilldown_index.extend(new_rows, cube, n_rows, month_order),
+            merge_account_types(self.account_types, build_account_type_lookup(new_rows)),
+            merge_category_codes(self.category_codes, build_category_codes(new_rows)),
+            self.batches | ingested_batches(new_rows),
+        )
+        return ledger, new_rows
+
+    def with_frame(self, frame):
+        """This ledger served from ``frame``, the same rows (e.g. the memory maps of its stored copy)."""
+        return LoadedLedger(frame, self.version, self.cube, self.search_index, self.drilldown_index,
+                            self.account_types, self.category_codes, self.batches)
+
+
+def partition_path(root, company, year):
+    return os.path.join(root, company, str(year))
+
+
+def list_partitions(root):
+    """Sorted (company, year) pairs of the partitions stored under ``root``."""
+    partitions = []
+    if not os.path.isdir(root):
+        return partitions
+    for company in os.listdir(root):
+        company_dir = os.path.join(root, company)
+        if not os.path.isdir(company_dir):
+            continue
+        for year in os.listdir(company_dir):
+            if year.isdigit() and os.path.exists(os.path.join(company_dir, year, LEDGER_DIR, MANIFEST)):
+                partitions.append((company, int(year)))
+    return sorted(partitions)
+
+
+def open_partition(root, company, year):
+    """The ledger frame of one partition, backed by memory maps of its files."""
+    return open_columnar(os.path.join(partition_path(root, company, year), LEDGER_DIR))
+
+
+def partition_source(root, company, year):
+    """
+    The data directory currently published for a partition. Every
+    ``write_partition`` publishes a new one, so a loaded partition whose
+    source differs has been rewritten since.
+    """
+    return os.path.realpath(os.path.join(partition_path(root, company, year), LEDGER_DIR))
+
+
+def write_partition(frame, root, company, year):
+    """Stores ``frame`` as the (company, year) partition, replacing it atomically."""
+    write_columnar(frame, os.path.join(partition_path(root, company, year), LEDGER_DIR))
+    return company, year
+
+
+def write_partitions(frame, root, company):
+    """
+    Splits a ledger by 'שנה' and stores every year as a partition of
+    ``company``; returns the (company, year) pairs written.
+    """
+    if 'שנה' not in frame.columns:
+        raise ValueError("the ledger has no 'שנה' column to partition by")
+    written = []
+    for year, part in frame.groupby('שנה', observed=True, sort=True):
+        # Category sets of the whole export would show as empty rows in this year's reports
+        part = part.reset_index(drop=True)
+        part = part.assign(**{column: part[column].cat.remove_unused_categories() for column in part.columns
+                              if isinstance(part[column].dtype, pd.CategoricalDtype)})
+        written.append(write_partition(part, root, company, int(year)))
+    return written
+
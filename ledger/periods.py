@@ -0,0 +1,70 @@
+"""
+Period engine: quarter, half-year, YTD, rolling-12 and total columns.
+
+Every period is a 0/1 column of a ``(months × periods)`` mapping matrix built
+from the cube's month axis, so all period columns of a report come from one
+``values @ matrix`` product instead of one ``sum(axis=1)`` per period.
+Multi-year ledgers get one column per (year, period).
+"""
+
+import numpy as np
+
+PERIOD_KINDS = ('quarter', 'half', 'ytd', 'rolling12')
+
+TOTAL_LABEL = 'סה"כ'
+
+
+def _grouped_columns(keys, valid, label):
+    """One 0/1 column per distinct key among the valid months."""
+    distinct = np.unique(keys[valid])
+    matrix = (keys[:, None] == distinct[None, :]) & valid[:, None]
+    return [label(key) for key in distinct], matrix
+
+
+def period_matrix(axis, kinds=(), default_year=None):
+    """
+    Returns (labels, matrix) for the requested period ``kinds`` plus the total.
+
+    ``axis`` lists the cube's month columns as (year, month number) pairs;
+    year may be None for ledgers without dates, in which case
+    ``default_year`` is used for labels and month arithmetic. Month number is
+    None for month labels outside the calendar - those only count in the total.
+    """
+    years = [default_year if year is None else year for year, _ in axis]
+    months = [month for _, month in axis]
+    valid = np.array([year is not None and month is not None for year, month in zip(years, months)], dtype=bool)
+    year_arr = np.array([year or 0 for year in years], dtype=np.int64)
+    month_arr = np.array([month or 1 for month in months], dtype=np.int64)
+
+    labels, blocks = [], []
+    if 'quarter' in kinds:
+        keys = year_arr * 4 + (month_arr - 1) // 3
+        block_labels, block = _grouped_columns(keys, valid, lambda k: f'Q{k % 4 + 1}/{k // 4}')
+        labels += block_labels
+        blocks.append(block)
+    if 'half' in kinds:
+        keys = year_arr * 2 + (month_arr - 1) // 6
+        block_labels, block = _grouped_columns(keys, valid, lambda k: f'H{k % 2 + 1}/{k // 2}')
+        labels += block_labels
+        blocks.append(block)
+    if 'ytd' in kinds:
+        block_labels, block = _grouped_columns(year_arr, valid, lambda k: f'YTD/{k}')
+        labels += block_labels
+        blocks.append(block)
+    if 'rolling12' in kinds and valid.any():
+        absolute = year_arr * 12 + month_arr - 1
+        latest = absolute[valid].max()
+        block = valid & (absolute > latest - 12)
+        labels.append('12 חודשים אחרונים')
+        blocks.append(block[:, None])
+
+    labels.append(TOTAL_LABEL)
+    blocks.append(np.ones((len(axis), 1), dtype=bool))
+    return labels, np.hstack(blocks).astype(np.float64)
+
+
+def period_kinds_from_options(selected):
+    """Maps the report's period checklist values to period kinds ('show' = quarters)."""
+    selected = selected or []
+    kinds = ['quarter'] if 'show' in selected else []
+    return tuple(kinds + [kind for kind in PERIOD_KINDS[1:] if kind in selected])
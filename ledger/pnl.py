@@ -0,0 +1,125 @@
+"""
+Profit & loss statement lines (ProcessedMonthlyData.totals in src/types/reportTypes.ts).
+
+Every 'קוד מיון' category is assigned to one P&L section by its sort code,
+as in src/components/reports/MonthlyReport/index.tsx. A section x category
+one-hot matrix times the cube's category x month totals gives the four
+section rows, and a fixed line x section coefficient
+matrix turns those into every statement line - revenue, COGS, gross profit,
+operating expenses, operating profit, financial expenses and net profit -
+for all months at once. The work grows with categories x months, not with
+ledger lines, so the statement is recomputed on every filter change.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ledger.classification import INCOME
+
+REVENUE, COGS, OPERATING, FINANCIAL = range(4)
+
+# Sections of the sort codes MonthlyReport/index.tsx lists: 600/700 revenue,
+# 800/806 COGS, 801/802/804/805/811 operating, 813/990/991 financial
+CODE_SECTIONS = {
+    600: REVENUE, 700: REVENUE,
+    800: COGS, 806: COGS,
+    801: OPERATING, 802: OPERATING, 804: OPERATING, 805: OPERATING, 811: OPERATING,
+    813: FINANCIAL, 990: FINANCIAL, 991: FINANCIAL,
+}
+
+# Codes missing from CODE_SECTIONS fall back to ranges by lower bound:
+# 600-799 revenue, 800 COGS, 801-812 operating, 813 and up financial
+SECTION_BOUNDS = (600, 800, 801, 813)
+
+# Sections of categories without a sort code (e.g. the sample ledger)
+DEFAULT_SECTION = OPERATING
+NAMED_SECTIONS = {INCOME: REVENUE}
+
+# (line label, coefficient per section, subtotal?). 'סכום' holds revenue as
+# booked and expenses as positive magnitudes, so expenses enter with -1.
+PNL_LINES = (
+    ('הכנסות', (1, 0, 0, 0), False),
+    ('עלות המכר', (0, -1, 0, 0), False),
+    ('רווח גולמי', (1, -1, 0, 0), True),
+    ('הוצאות תפעול', (0, 0, -1, 0), False),
+    ('רווח תפעולי', (1, -1, -1, 0), True),
+    ('הוצאות מימון', (0, 0, 0, -1), False),
+    ('רווח נקי', (1, -1, -1, -1), True),
+)
+
+LINE_COLUMN = 'שורה'
+
+LINE_COEFFICIENTS = np.array([line for _, line, _ in PNL_LINES], dtype=np.float64)
+
+
+def build_category_codes(dataframe):
+    """
+    Returns a Series mapping every 'קוד מיון' to the lowest 'מספר קוד מיון'
+    booked under it (NaN for categories without sort codes).
+    """
+    categories = dataframe['קוד מיון']
+    if 'מספר קוד מיון' not in dataframe.columns:
+        labels = pd.Index(pd.unique(categories.dropna()).astype(object))
+        return pd.Series(np.nan, index=labels, name='code')
+    sort_codes = pd.Series(pd.array(dataframe['מספר קוד מיון'], dtype='Float64'), index=dataframe.index)
+    lowest = sort_codes.groupby(categories, observed=True).min()
+    return pd.Series(lowest.to_numpy(dtype=np.float64, na_value=np.nan), index=lowest.index.astype(object),
+                     name='code')
+
+
+def merge_category_codes(codes, other):
+    """Combines two sort-code lookups, keeping every category's lowest code."""
+    return pd.concat([codes, other]).groupby(level=0).min()
+
+
+def code_section(code):
+    """The P&L section of one sort code, or -1 below the revenue range."""
+    section = CODE_SECTIONS.get(int(code))
+    if section is None:
+        section = int(np.searchsorted(SECTION_BOUNDS, code, side='right')) - 1
+    return section
+
+
+def category_sections(category_codes):
+    """
+    Returns a Series mapping every category of ``category_codes`` (see
+    build_category_codes) to its P&L section; categories without a usable
+    sort code are assigned by name.
+    """
+    sections = [code_section(code) if not np.isnan(code) else -1 for code in category_codes.to_numpy()]
+    fallback = [NAMED_SECTIONS.get(category, DEFAULT_SECTION) for category in category_codes.index]
+    return pd.Series(np.where(np.asarray(sections, dtype=np.int64) >= 0, sections, fallback).astype(np.int64),
+                     index=category_codes.index, name='section')
+
+
+def build_category_sections(dataframe):
+    """Returns a Series mapping every 'קוד מיון' to its P&L section, by its lowest sort code."""
+    return category_sections(build_category_codes(dataframe))
+
+
+def pnl_matrix(cube, category_sections, cogs_adjustment=None):
+    """
+    Returns the (len(PNL_LINES) x len(cube.months)) statement matrix of ``cube``.
+
+    ``cogs_adjustment`` (one value per month column, e.g. the inventory change
+    from ledger.inventory) is added to the COGS section before the lines are derived.
+    """
+    category_totals = cube.category_totals()
+    sections = category_sections.reindex(cube.categories).to_numpy(dtype=np.float64)
+    fallback = [NAMED_SECTIONS.get(category, DEFAULT_SECTION) for category in cube.categories]
+    sections = np.where(np.isnan(sections), fallback, sections).astype(np.int64)
+
+    one_hot = np.zeros((LINE_COEFFICIENTS.shape[1], len(cube.categories)))
+    one_hot[sections, np.arange(len(cube.categories))] = 1.0
+    section_totals = one_hot @ category_totals
+    if cogs_adjustment is not None:
+        section_totals[COGS] += cogs_adjustment
+    return LINE_COEFFICIENTS @ section_totals
+
+
+def cogs_line_deltas(cogs_delta):
+    """
+    Change of every statement line for a change ``cogs_delta`` of the COGS
+    section (one value per column): the lines are linear in the sections.
+    """
+    return np.outer(LINE_COEFFICIENTS[:, COGS], cogs_delta)
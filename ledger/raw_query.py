@@ -0,0 +1,221 @@
+"""
+Server-side filtering, sorting and paging for the raw transactions table.
+
+Translates the DataTable ``filter_query`` / ``sort_by`` / paging props into
+pandas operations so only one page of the ledger is serialized per request.
+"""
+
+import logging
+import math
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# (query operator, normalized operator) - longest tokens first so '>=' wins over '>'
+FILTER_OPERATORS = [
+    ('>=', 'ge'), ('<=', 'le'), ('!=', 'ne'), ('<', 'lt'), ('>', 'gt'), ('=', 'eq'),
+    ('ge', 'ge'), ('le', 'le'), ('ne', 'ne'), ('lt', 'lt'), ('gt', 'gt'), ('eq', 'eq'),
+    ('contains', 'contains'), ('datestartswith', 'datestartswith'),
+]
+
+# Operators that compare values; the others match the text of a cell, so their operand stays text
+RELATIONAL_OPERATORS = {'eq', 'ne', 'lt', 'le', 'gt', 'ge'}
+
+# DataTable's operators without an operand (query form, normalized operator)
+UNARY_OPERATORS = [
+    ('is blank', 'blank'), ('is nil', 'nil'), ('is num', 'num'), ('is str', 'str'),
+    ('is even', 'even'), ('is odd', 'odd'),
+]
+
+
+def split_filter_part(filter_part):
+    """
+    Splits one '&&'-separated clause into (column, operator, value, ignore_case).
+
+    Accepts the forms DataTable emits, e.g. ``{סכום} s> 100`` or
+    ``{חשבון} icontains "שכר"``; the 'i' prefix makes the comparison
+    case-insensitive, 's' (or none) case-sensitive, as in native filtering.
+    Unquoted operands of relational operators are read as numbers; the
+    operand of 'contains' / 'datestartswith' keeps the text as typed. Unary
+    operators (``{פרטים} is blank``) come back with the value None. Returns
+    (None, None, None, False) if unparsable.
+    """
+    filter_part = filter_part.strip()
+    if not filter_part.startswith('{'):
+        return None, None, None, False
+    end = filter_part.find('}')
+    if end == -1:
+        return None, None, None, False
+    column = filter_part[1:end]
+    rest = filter_part[end + 1:].strip()
+
+    for token, operator in UNARY_OPERATORS:
+        if rest == token:
+            return column, operator, None, False
+    for token, operator in FILTER_OPERATORS:
+        for prefix in ('s', 'i', ''):
+            candidate = prefix + token
+            if rest.startswith(candidate) and (len(rest) == len(candidate) or not token.isalpha()
+                                               or rest[len(candidate)] == ' '):
+                value = rest[len(candidate):].strip()
+                if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'", '`'):
+                    value = value[1:-1].replace('\\' + value[0], value[0])
+                elif operator in RELATIONAL_OPERATORS:
+                    try:
+                        value = float(value)
+                    except ValueError:
+                        pass
+                return column, operator, value, prefix == 'i'
+    return None, None, None, False
+
+
+def _as_text(series, value, ignore_case):
+    series, value = series.astype(str), str(value)
+    if ignore_case:
+        return series.str.lower(), value.lower()
+    return series, value
+
+
+def _unary_mask(series, operator):
+    missing = series.isna().to_numpy()
+    if operator == 'nil':
+        return missing
+    if operator == 'blank':
+        return missing | (series.astype(str) == '').to_numpy()
+    if pd.api.types.is_numeric_dtype(series):
+        numbers = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        if operator == 'num':
+            return ~missing
+        if operator == 'str':
+            return np.zeros(len(series), dtype=bool)
+        remainder = np.where(missing, np.nan, np.mod(numbers, 2))
+        return remainder == (0 if operator == 'even' else 1)
+    is_str = series.map(lambda cell: isinstance(cell, str)).to_numpy(dtype=bool)
+    if operator == 'str':
+        return is_str
+    # 'num' / 'even' / 'odd' test the cell's type, and text cells are not numbers
+    return np.zeros(len(series), dtype=bool)
+
+
+def _clause_mask(series, operator, value, ignore_case=False):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Evaluate once per category, then broadcast through the integer codes
+        category_mask = _clause_mask(pd.Series(series.cat.categories), operator, value, ignore_case)
+        codes = series.cat.codes.to_numpy()
+        return np.append(category_mask, operator in ('blank', 'nil'))[codes]
+    if any(operator == unary for _, unary in UNARY_OPERATORS):
+        return _unary_mask(series, operator)
+    if operator == 'contains':
+        series, value = _as_text(series, value, ignore_case)
+        return series.str.contains(value, regex=False).to_numpy()
+    if operator == 'datestartswith':
+        series, value = _as_text(series, value, ignore_case)
+        return series.str.startswith(value).to_numpy()
+
+    if pd.api.types.is_numeric_dtype(series):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return np.zeros(len(series), dtype=bool)
+    else:
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        series, value = _as_text(series, value, ignore_case)
+
+    if operator == 'eq':
+        return (series == value).to_numpy()
+    if operator == 'ne':
+        return (series != value).to_numpy()
+    if operator == 'lt':
+        return (series < value).to_numpy()
+    if operator == 'le':
+        return (series <= value).to_numpy()
+    if operator == 'gt':
+        return (series > value).to_numpy()
+    if operator == 'ge':
+        return (series >= value).to_numpy()
+    return np.ones(len(series), dtype=bool)
+
+
+def filter_mask(dataframe, filter_query):
+    """
+    Returns a boolean NumPy mask for ``filter_query`` (all True if empty).
+
+    A clause that cannot be parsed (an operator DataTable has but this module
+    does not, e.g. ``is prime``) matches no rows rather than being ignored.
+    """
+    mask = np.ones(len(dataframe), dtype=bool)
+    for filter_part in (filter_query or '').split(' && '):
+        if not filter_part.strip():
+            continue
+        column, operator, value, ignore_case = split_filter_part(filter_part)
+        if column is None:
+            logger.warning('unsupported filter clause %r', filter_part)
+            return np.zeros(len(dataframe), dtype=bool)
+        if column not in dataframe.columns:
+            continue
+        mask &= _clause_mask(dataframe[column], operator, value, ignore_case)
+    return mask
+
+
+def _sort_key(series, ascending):
+    """
+    Float sort key for one column: categories by their order, text by value,
+    missing values last in either direction (as ``sort_values`` does).
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        key = series.cat.codes.to_numpy().astype(np.float64)
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        key = series.to_numpy().view(np.int64).astype(np.float64)
+    elif pd.api.types.is_numeric_dtype(series):
+        key = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        key = pd.factorize(series, sort=True)[0].astype(np.float64)
+    # np.where allocates: the column's own buffer may be shared or read-only
+    key = np.where(series.isna().to_numpy(), np.nan, key)
+    return key if ascending else -key
+
+
+def query_positions(dataframe, sort_by=None, filter_query=''):
+    """
+    Returns the row positions of ``dataframe`` selected by ``filter_query``,
+    in ``sort_by`` order.
+
+    Works on the columns' NumPy buffers only, so the (possibly memory-mapped)
+    ledger is never copied to answer a page request.
+    """
+    positions = np.arange(len(dataframe))
+    if filter_query:
+        positions = np.flatnonzero(filter_mask(dataframe, filter_query))
+
+    sort_by = [s for s in (sort_by or []) if s.get('column_id') in dataframe.columns]
+    if sort_by and len(positions):
+        # np.lexsort is stable and takes the primary key last
+        keys = [_sort_key(dataframe[s['column_id']], s['direction'] == 'asc')[positions]
+                for s in reversed(sort_by)]
+        positions = positions[np.lexsort(keys)]
+    return positions
+
+
+def apply_query(dataframe, sort_by=None, filter_query=''):
+    """Returns ``dataframe`` filtered by ``filter_query`` and sorted by ``sort_by``."""
+    if not filter_query and not sort_by:
+        return dataframe
+    return dataframe.take(query_positions(dataframe, sort_by, filter_query))
+
+
+def query_page(dataframe, page_current=0, page_size=10, sort_by=None, filter_query=''):
+    """
+    Returns (records, page_count) for one page of ``dataframe``.
+
+    Filtering and sorting produce row positions; only the requested page's
+    rows are taken from the frame and converted to records.
+    """
+    page_current = page_current or 0
+    positions = query_positions(dataframe, sort_by, filter_query)
+
+    page_count = max(1, math.ceil(len(positions) / page_size))
+    start = page_current * page_size
+    return dataframe.take(positions[start:start + page_size]).to_dict('records'), page_count
@@ -0,0 +1,125 @@
+"""
+N-gram index behind the search bar.
+
+Each text column is indexed over its distinct values, not its rows: the
+values are concatenated, every position contributes one trigram key, and
+the sorted (trigram, value id) pairs form the posting lists. A query looks
+up its trigrams with ``searchsorted``, intersects the postings, verifies the
+few candidates, and maps matching value ids back to rows through the
+column's integer codes - no per-keystroke scan of the ledger text.
+Appended rows only add codes, plus a rebuild of a field's (small) value
+index when they bring values it has not seen.
+"""
+
+import numpy as np
+import pandas as pd
+
+SEARCH_FIELDS = ('חשבון', 'קוד מיון', 'פרטים')
+
+# Code points fit in 21 bits, so three of them pack into one int64 key
+_RADIX = 0x110000
+_PAD = '\x00\x00'
+
+
+def _code_points(text):
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+
+
+class TextIndex:
+    """Trigram index over a list of distinct strings (case-insensitive)."""
+
+    def __init__(self, values):
+        self.texts = [str(value).lower() for value in values]
+        lengths = np.fromiter((len(text) + len(_PAD) for text in self.texts), dtype=np.int64,
+                              count=len(self.texts))
+        codes = _code_points(''.join(text + _PAD for text in self.texts))
+        owners = np.repeat(np.arange(len(self.texts), dtype=np.int64), lengths)
+
+        # Every non-padding position starts one trigram; trailing padding lets
+        # one- and two-character queries use the same keys as prefixes
+        codes = np.concatenate([codes, np.zeros(2, dtype=np.int64)])
+        starts = np.flatnonzero(codes[:-2] != 0)
+        keys = codes[starts] * _RADIX * _RADIX + codes[starts + 1] * _RADIX + codes[starts + 2]
+        owners = owners[starts]
+
+        order = np.lexsort((owners, keys))
+        keys, owners = keys[order], owners[order]
+        distinct = np.ones(len(keys), dtype=bool)
+        distinct[1:] = (keys[1:] != keys[:-1]) | (owners[1:] != owners[:-1])
+        self.keys = keys[distinct]
+        self.owners = owners[distinct]
+
+    def _postings(self, low, high):
+        start, stop = np.searchsorted(self.keys, [low, high], side='left')
+        return self.owners[start:stop]
+
+    def search(self, query):
+        """Returns the sorted ids of values containing ``query`` as a substring."""
+        query = query.lower()
+        q = _code_points(query)
+        if len(q) == 0:
+            return np.arange(len(self.texts))
+        if len(q) < 3:
+            # All trigrams starting with the query form one contiguous key range
+            span = _RADIX ** (3 - len(q))
+            low = int(sum(c * _RADIX ** (2 - i) for i, c in enumerate(q)))
+            return np.unique(self._postings(low, low + span))
+
+        candidates = None
+        for i in range(len(q) - 2):
+            key = int(q[i] * _RADIX * _RADIX + q[i + 1] * _RADIX + q[i + 2])
+            ids = self._postings(key, key + 1)
+            candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+            if len(candidates) == 0:
+                return candidates
+        if len(q) == 3:
+            return candidates
+        return np.array([i for i in candidates if query in self.texts[i]], dtype=np.int64)
+
+
+class LedgerSearchIndex:
+    """Row-level search over the ledger's account, category and details columns."""
+
+    def __init__(self, dataframe, fields=SEARCH_FIELDS):
+        self.n_rows = len(dataframe)
+        self.fields = {}
+        for field in fields:
+            if field in dataframe.columns:
+                codes, uniques = pd.factorize(dataframe[field])
+                self.fields[field] = (codes, pd.Index(np.asarray(uniques, dtype=object)), TextIndex(uniques))
+
+    def extend(self, new_rows):
+        """Returns an index over the indexed rows followed by ``new_rows``."""
+        extended = LedgerSearchIndex.__new__(LedgerSearchIndex)
+        extended.n_rows = self.n_rows + len(new_rows)
+        extended.fields = {}
+        for field, (codes, uniques, index) in self.fields.items():
+            values = new_rows[field] if field in new_rows.columns else pd.Series([None] * len(new_rows))
+            new_codes = uniques.get_indexer(values)
+            unseen = values[(new_codes < 0) & values.notna().to_numpy()].unique()
+            if len(unseen):
+                uniques = uniques.append(pd.Index(unseen))
+                new_codes = uniques.get_indexer(values)
+                index = TextIndex(uniques)
+            extended.fields[field] = (np.concatenate([codes, new_codes]), uniques, index)
+        return extended
+
+    def row_mask(self, query, start=0):
+        """
+        Returns a boolean mask of rows matching ``query``, or None for an empty query.
+
+        Whitespace-separated terms must all match; each term may match any field.
+        With ``start``, only rows from that position on are tested and masked.
+        """
+        terms = (query or '').split()
+        if not terms:
+            return None
+        mask = np.ones(self.n_rows - start, dtype=bool)
+        for term in terms:
+            term_mask = np.zeros(self.n_rows - start, dtype=bool)
+            for codes, _, index in self.fields.values():
+                hit = np.zeros(len(index.texts) + 1, dtype=bool)  # last slot catches code -1 (NaN)
+                hit[index.search(term)] = True
+                term_mask |= hit[codes[start:]]
+            mask &= term_mask
+        return mask
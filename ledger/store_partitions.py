@@ -0,0 +1,27 @@
+"""
+Stores an ERP transactions export as company/year partitions (see ledger.partitions).
+
+    python -m ledger.store_partitions export.csv --root /srv/ledgers --company "חברה בע\"מ"
+
+Years already stored for the company are replaced by the export's lines of that year.
+"""
+
+import argparse
+
+from ledger.loader import load_ledger
+from ledger.partitions import write_partitions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('csv', help='ERP transactions export')
+    parser.add_argument('--root', required=True, help='partition root (LEDGER_PARTITIONS)')
+    parser.add_argument('--company', required=True, help='company directory name')
+    args = parser.parse_args(argv)
+
+    for company, year in write_partitions(load_ledger(args.csv), args.root, args.company):
+        print(f'{company}/{year}')
+
+
+if __name__ == '__main__':
+    main()
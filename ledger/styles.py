@@ -0,0 +1,134 @@
+"""
+Style-rule compiler for the report DataTables.
+
+Emits a fixed set of ``filter_query`` / ``column_id`` rules per table instead
+of one rule per row and per negative cell, so the size of
+``style_data_conditional`` depends on the number of columns only. Rules are
+matched by the browser against the row data, which also keeps the colouring
+correct after native sorting and filtering.
+
+Every report row carries a 'סוג' field: 'הכנסות', 'הוצאות' or the total-row
+marker 'סה"כ'. Dash applies later rules over earlier ones, so the total-row
+rule is always emitted last.
+"""
+
+from ledger.classification import INCOME, EXPENSE
+
+TOTAL_ROW_MARKER = 'סה"כ'
+
+# d3-format specifier applied by DataTable in the browser: thousands separator, no decimals
+NUMBER_FORMAT = {'specifier': ',.0f'}
+
+
+def field(column_id):
+    """Returns a filter_query field reference for ``column_id``."""
+    return '{' + column_id.replace('}', '\\}') + '}'
+
+
+def type_query(row_type):
+    """Returns a filter_query matching rows whose 'סוג' equals ``row_type``."""
+    quote = "'" if '"' in row_type else '"'
+    return f'{field("סוג")} = {quote}{row_type}{quote}'
+
+
+def _row_type_rules(colors):
+    return [
+        {'if': {'row_index': 'odd'}, 'backgroundColor': colors['light_gray']},
+        {
+            'if': {'filter_query': type_query(INCOME)},
+            'backgroundColor': colors['income_color'],
+            'color': colors['text_income'],
+        },
+        {
+            'if': {'filter_query': type_query(EXPENSE)},
+            'backgroundColor': colors['expense_color'],
+            'color': colors['text_expense'],
+        },
+    ]
+
+
+def _negative_rules(colors, value_cols):
+    return [
+        {
+            'if': {'filter_query': f'{field(col)} < 0', 'column_id': col},
+            'color': colors['text_expense'],
+        }
+        for col in value_cols
+    ]
+
+
+def _total_row_rule(colors):
+    return {
+        'if': {'filter_query': type_query(TOTAL_ROW_MARKER)},
+        'backgroundColor': colors['primary_green'],
+        'color': 'white',
+        'fontWeight': 'bold',
+        'fontSize': '16px',
+    }
+
+
+def table_columns(label_cols, value_cols):
+    """
+    DataTable column definitions; value columns are numeric with NUMBER_FORMAT,
+    so the cells show 1,234 without shipping a formatted tooltip per cell.
+    """
+    return (
+        [{'name': col, 'id': col} for col in label_cols]
+        + [{'name': col, 'id': col, 'type': 'numeric', 'format': NUMBER_FORMAT} for col in value_cols]
+    )
+
+
+def hierarchical_table_styles(colors, group_level, value_cols):
+    """Compiles style_data_conditional for the hierarchical report."""
+    rules = _row_type_rules(colors)
+
+    # Specific styling for hierarchy levels
+    if group_level == 'חשבון':
+        rules.append({'if': {'column_id': 'חשבון'}, 'fontWeight': 'bold'})
+    else:
+        rules.append({'if': {'column_id': 'קוד מיון'}, 'fontWeight': 'bold', 'fontSize': '15px'})
+        if group_level in ('קוד מיון + חשבון', 'עץ'):
+            rules.append({'if': {'column_id': 'חשבון'}, 'paddingRight': '30px'})  # Indent sub-items
+        if group_level == 'עץ':
+            # Category / account nodes expand and collapse when their label is clicked
+            rules.append({'if': {'column_id': 'קוד מיון', 'filter_query': '{חשבון} is blank'}, 'cursor': 'pointer'})
+            rules.append({'if': {'column_id': 'חשבון', 'filter_query': '{ספק} is blank'}, 'cursor': 'pointer'})
+            rules.append({'if': {'column_id': 'ספק'}, 'paddingRight': '50px'})
+
+    rules.extend(_negative_rules(colors, value_cols))
+
+    if 'סה"כ' in value_cols:
+        rules.append({
+            'if': {'column_id': 'סה"כ'},
+            'backgroundColor': colors['sub_header_bg'],
+            'color': 'white',
+            'fontWeight': 'bold',
+        })
+
+    rules.append(_total_row_rule(colors))
+    return rules
+
+
+def pnl_table_styles(colors, line_column, value_cols):
+    """Compiles style_data_conditional for the P&L statement (subtotal lines use the total-row marker)."""
+    rules = _row_type_rules(colors)
+    rules.append({'if': {'column_id': line_column}, 'fontWeight': 'bold'})
+    rules.extend(_negative_rules(colors, value_cols))
+    rules.append(_total_row_rule(colors))
+    return rules
+
+
+def pivot_table_styles(colors, index_levels, value_cols):
+    """Compiles style_data_conditional for the pivot table."""
+    rules = _row_type_rules(colors)
+
+    if 'קוד מיון' in index_levels:
+        rules.append({'if': {'column_id': 'קוד מיון'}, 'fontWeight': 'bold'})
+        if 'חשבון' in index_levels:
+            rules.append({'if': {'column_id': 'חשבון'}, 'paddingRight': '30px'})
+
+    rules.extend(_negative_rules(colors, value_cols))
+    rules.extend({'if': {'column_id': col}, 'textAlign': 'left'} for col in value_cols)
+
+    rules.append(_total_row_rule(colors))
+    return rules
@@ -0,0 +1,129 @@
+"""
+Vendor resolution for ledger lines (the Python side of src/utils/vendorMapper.ts).
+
+Lines booked against the generic suppliers account (``UNMAPPED_VENDOR_ACCOUNT``)
+are attributed to a vendor by keywords in their 'פרטים' text; every other
+line's vendor is its counter account. All keywords are compiled into one
+regular expression, which runs once per distinct 'פרטים' value - not once
+per keyword per row - and the result is stored as the 'ספק' categorical.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+VENDOR_COLUMN = 'ספק'
+
+# Counter account whose lines carry the real vendor only in 'פרטים'
+UNMAPPED_VENDOR_ACCOUNT = 37999
+
+# (keywords, vendor key, vendor name) - same table and priority order as VENDOR_MAPPINGS in vendorMapper.ts
+VENDOR_MAPPINGS = (
+    # תקשורת
+    (('בזק', 'BEZEQ'), 20000, 'בזק'),
+    (('פנגו', 'PANGO'), 20010, 'פנגו'),
+    (('כביש 6',), 20011, 'כביש 6'),
+    # שילוח ולוגיסטיקה
+    (('תפוז',), 20013, 'תפוז שליחויות בע"מ'),
+    (('פלאנט', 'PLANET', 'MODI'), 20035, 'פלאנט שילוח ולוגיסטיקה בע"מ'),
+    # שיווק ופרסום
+    (('GOOGLE', 'גוגל'), 20042, 'Google'),
+    (('שנטי גדרון',), 20044, 'שנטי גדרון'),
+    (('ZENDESK',), 20082, 'zendesk שירות לקוחות 80010'),
+    (('META', 'FACEBK', 'פייסבוק', 'FACEBOOK'), 30068, 'META/ פייסבוק'),
+    (('KLAVIYO',), 20142, 'Klaviyo Inc אימייל מרק 50012'),
+    # סליקה ותשלומים
+    (('פייפלוס', 'פאיפלוס', 'פאי פלוס', 'PAY PLUS'), 20097, 'פיי פלוס בע"מ'),
+    (('שופיפיי', 'SHOPIFY'), 20104, 'Shopify International Limited'),
+    (('ביימי', 'ביי מי', 'BUYME'), 20105, 'ביימי טכנולוגיות בע"מ'),
+    # ייעוץ ושירותים מקצועיים
+    (('עומר להט',), 20122, 'עומר להט'),
+    (('שביט וזהו',), 20128, 'שביט וזהו בע"מ'),
+    (('רעות תקני',), 20145, 'רעות תקני לי'),
+    # רכב וליסינג
+    (('ליסקאר', 'LISCAR', 'מנהרות', 'מוקד'), 30677, 'ליסקאר'),
+    (('תדלק', 'סולר', 'דלק'), 30697, 'תדלק וסע בע"מ'),
+    # רשתות קמעונאיות
+    (('וויסל',), 30345, 'וויסל סחר בע"מ'),
+    (('סטודנט גרופ',), 30452, 'סטודנט גרופ ס.ג בע"מ'),
+    (('סופרפארם', 'SUPERPHARM'), 30696, 'סופר פארם בע"מ'),
+    # תוכנה ומערכות
+    (('גולדנטק', 'GOODS'), 30710, 'גולדנטק מערכות מידע בע"מ - goods'),
+    (('ADOBE', 'אדובי'), 37095, 'ADOBE- ספקי אינטרנט 80038'),
+    (('FIGMA', 'פיגמה'), 37140, '80021 -FIGMA'),
+    # הנהלת חשבונות וייעוץ עסקי
+    (('ליתאי',), 30782, 'ליתאי ניהול שירותים בע"מ'),
+    (('להב',), 30787, 'להב פיתוח מנהלים בע"מ'),
+    (('פזמ',), 30789, 'פזמ שיווק ופרסום בע"מ'),
+    (('קרני', 'אוריקס'), 30761, 'קרני ראם- אוריקס פאונדס בע"מ'),
+    # ספקים נוספים
+    (('לובה שרגא',), 37013, 'לובה שרגא בע"מ'),
+    (('יעקבס גבינות',), 37014, 'יעקבס גבינות ולחמים בע"מ'),
+    (('יובל רשף',), 37015, 'יובל רשף'),
+    (('אלי אדרי',), 37044, 'אלי אדרי'),
+    (('פולסים',), 37068, 'פולסים בע"מ -50012-הוצ\' אימייל מרקטינג'),
+    (('מיכל אוליברו', 'ח.ח.ח'), 37093, 'ח.ח.ח טכנולוגיות בעמ (מיכל אוליברו)'),
+    (('ד.מ פוסט', 'דמ פוסט'), 37099, 'ד.מ פוסט בע"מ'),
+    (('מאיה מושל',), 37119, 'מאיה מושל רומנו'),
+    (('טריגלו', 'TRIGALO', 'B.M.A'), 37148, 'טריגלו-B.M.A TRIGALO-הובלות'),
+    (('לורן מיריאל', 'לורן שטרן'), 37149, 'לורן מיריאל שטרן'),
+)
+
+
+class VendorMatcher:
+    """
+    Keyword -> vendor matcher compiled from ``mappings``.
+
+    The keywords form one alternation inside a lookahead, so a single
+    ``findall`` reports the highest-priority keyword starting at every
+    position of a text. As in vendorMapper.ts, matching is case-insensitive
+    and the first mapping with any keyword contained in the text wins.
+    """
+
+    def __init__(self, mappings=VENDOR_MAPPINGS):
+        self.keys = np.array([key for _, key, _ in mappings], dtype=np.int64)
+        self.names = np.array([name for _, _, name in mappings], dtype=object)
+        self._priority = {}
+        for position, (keywords, _, _) in enumerate(mappings):
+            for keyword in keywords:
+                self._priority.setdefault(keyword.lower(), position)
+        alternatives = sorted(self._priority, key=self._priority.get)
+        self._pattern = re.compile('(?=(' + '|'.join(map(re.escape, alternatives)) + '))')
+
+    def _first_mapping(self, text):
+        hits = self._pattern.findall(text.lower())
+        return min(self._priority[hit] for hit in hits) if hits else -1
+
+    def match(self, details):
+        """Returns the position in ``mappings`` matched by every value of ``details`` (-1: none)."""
+        codes, uniques = pd.factorize(pd.Series(details, copy=False).fillna('').astype(str))
+        found = np.fromiter((self._first_mapping(text) for text in uniques), dtype=np.int64, count=len(uniques))
+        return found[codes]
+
+
+def _short_details(details):
+    """'37999 - <פרטים>' label of an unmatched line, as in resolveVendor()."""
+    text = details if len(details) <= 30 else details[:30] + '...'
+    return f'{UNMAPPED_VENDOR_ACCOUNT} - {text or "ספקים לשלם"}'
+
+
+def resolve_vendors(dataframe, matcher=None):
+    """
+    Returns the 'ספק' column for a ledger frame with 'ח-ן נגדי', 'שם חשבון נגדי'
+    and 'פרטים' columns, as a categorical (missing where a line has no counter account).
+    """
+    matcher = matcher or VendorMatcher()
+    counter_accounts = pd.array(dataframe['ח-ן נגדי'], dtype='Int64')
+    unmapped = (counter_accounts == UNMAPPED_VENDOR_ACCOUNT).to_numpy(dtype=bool, na_value=False)
+
+    vendors = np.array(dataframe['שם חשבון נגדי'].astype(object), dtype=object)
+    vendors[pd.isna(vendors) | (vendors == '')] = None
+    if unmapped.any():
+        # One label per distinct 'פרטים' text, spread back to the rows through the codes
+        codes, texts = pd.factorize(pd.Series(dataframe['פרטים'].to_numpy()[unmapped], dtype=object).fillna(''))
+        matched = matcher.match(texts)
+        labels = np.where(matched >= 0, matcher.names[np.maximum(matched, 0)],
+                          np.array([_short_details(str(text)) for text in texts], dtype=object))
+        vendors[unmapped] = labels[codes]
+    return pd.Series(pd.Categorical(vendors), index=dataframe.index, name=VENDOR_COLUMN)
@@ -0,0 +1,23 @@
+"""
+WSGI entry point for production.
+
+    gunicorn -c gunicorn.conf.py
+
+gunicorn.conf.py sets preload_app, so this module is imported once in the
+master process: the ledger, aggregation cube and search index are built by
+importing app, the report cache is warmed, and only then are workers
+forked. Workers share those pages copy-on-write instead of each loading
+the ledger again.
+"""
+
+import gc
+
+from app import app, warm_up
+
+warm_up()
+
+# Move everything built so far out of the GC's generations, so collections in
+# the workers don't write to (and un-share) the preloaded objects' pages
+gc.freeze()
+
+server = app.server